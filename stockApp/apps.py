@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StockAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stockApp'
+
+    def ready(self):
+        from stockApp import signals  # noqa: F401
@@ -0,0 +1,93 @@
+import asyncio
+import re
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from stockApp.encoders import dumps, loads
+from stockApp.store import get_redis
+
+MARKET_GROUP = "market"
+PENDING_UPDATES_KEY = "broadcast:pending"
+FLUSH_SCHEDULED_KEY = "broadcast:scheduled"
+
+
+def stock_group(symbol):
+    # Group names may only contain ASCII letters, digits, hyphens and periods
+    return "stock." + re.sub(r"[^a-zA-Z0-9\-.]", "_", symbol)
+
+
+def user_group(user_id):
+    return f"user.{user_id}"
+
+
+def broadcast(message, groups=(MARKET_GROUP,), event_type="chat.message", **extra):
+    broadcast_many([(groups, message)], event_type=event_type, **extra)
+
+
+def broadcast_many(messages, event_type="chat.message", **extra):
+    # Encoded once here, consumers forward the text to every socket as is
+    channel_layer = get_channel_layer()
+    sends = [
+        (group, {"type": event_type, "text": dumps(message).decode("utf-8"), **extra})
+        for groups, message in messages
+        for group in groups
+    ]
+
+    async def send_all():
+        await asyncio.gather(
+            *(channel_layer.group_send(group, event) for group, event in sends)
+        )
+
+    async_to_sync(send_all)()
+
+
+def buffer_updates(updates, window):
+    """Store the latest update of every symbol until the next flush.
+
+    Returns ``True`` when the caller has to schedule ``flush_updates``, which
+    happens once per broadcast window.
+    """
+    redis = get_redis()
+    redis.hset(
+        PENDING_UPDATES_KEY,
+        mapping={symbol: dumps(message) for symbol, message in updates.items()},
+    )
+    # Expires on its own in case the scheduled flush gets lost
+    return bool(redis.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=int(window) + 60))
+
+
+def flush_updates():
+    pipe = get_redis().pipeline()
+    pipe.hgetall(PENDING_UPDATES_KEY)
+    pipe.delete(PENDING_UPDATES_KEY, FLUSH_SCHEDULED_KEY)
+    pending, deleted = pipe.execute()
+    if not pending:
+        return 0
+
+    updates = {
+        symbol.decode("utf-8"): loads(value) for symbol, value in pending.items()
+    }
+    broadcast_many(
+        [((MARKET_GROUP,), {"type": "updates", "updates": list(updates.values())})]
+        + [
+            ((stock_group(symbol),), {"type": "updates", "updates": [update]})
+            for symbol, update in updates.items()
+        ]
+    )
+    return len(updates)
+
+
+def publish_updates(updates):
+    if not updates:
+        return
+
+    window = settings.BROADCAST_WINDOW
+    if window <= 0:
+        buffer_updates(updates, window)
+        flush_updates()
+    elif buffer_updates(updates, window):
+        from stockApp.tasks import flush_market_updates
+
+        flush_market_updates.apply_async(countdown=window)
@@ -0,0 +1,77 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+QUOTES_VERSION_KEY = "quotes:version"
+STOCKS_VERSION_KEY = "stocks:version"
+
+
+def get_quotes_version():
+    version = cache.get(QUOTES_VERSION_KEY)
+    if version is None:
+        cache.add(QUOTES_VERSION_KEY, 1, timeout=None)
+        version = cache.get(QUOTES_VERSION_KEY, 1)
+    return version
+
+
+def bump_quotes_version():
+    """Invalidate every cached price list after quotes were written."""
+    try:
+        cache.incr(QUOTES_VERSION_KEY)
+    except ValueError:
+        cache.add(QUOTES_VERSION_KEY, 1, timeout=None)
+
+
+def get_stocks_version():
+    version = cache.get(STOCKS_VERSION_KEY)
+    if version is None:
+        cache.add(STOCKS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(STOCKS_VERSION_KEY)
+    return version
+
+
+def bump_stocks_version():
+    """Make every process rebuild its search index after stocks changed.
+
+    A random token is used instead of a counter, so a flushed cache can not
+    bring back a version an index was already built for.
+    """
+    cache.set(STOCKS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def prices_key(request, version):
+    url = hashlib.md5(request.build_absolute_uri().encode("utf-8")).hexdigest()
+    return f"prices:{version}:{url}"
+
+
+def following_key(user_id):
+    return f"following:{user_id}"
+
+
+def get_following_quotes(user_id, version):
+    cached = cache.get(following_key(user_id))
+    if cached is None or cached[0] != version:
+        return None
+    return cached[1]
+
+
+def set_following_quotes(user_id, version, quotes):
+    cache.set(following_key(user_id), (version, quotes), settings.QUOTES_CACHE_TIMEOUT)
+
+
+def invalidate_following_quotes(user_id):
+    cache.delete(following_key(user_id))
+
+
+def stock_request_key(job_id):
+    return f"stock-request:{job_id}"
+
+
+def get_stock_request_owner(job_id):
+    return cache.get(stock_request_key(job_id))
+
+
+def set_stock_request_owner(job_id, user_id):
+    cache.set(stock_request_key(job_id), user_id, settings.STOCK_REQUEST_TIMEOUT)
@@ -1,14 +1,141 @@
-import json
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
 
-from channels.generic.websocket import WebsocketConsumer
-from asgiref.sync import async_to_sync
+from stockApp.broadcast import MARKET_GROUP, stock_group, user_group
+from stockApp.encoders import dumps, loads
+from stockApp.models import StockData
+from stockApp.quotes import get_snapshot
 
+ALL_SYMBOLS = "*"
+MAX_SUBSCRIPTIONS = 500
+# Group names are limited to 100 characters, symbols stay far below that
+MAX_SYMBOL_LENGTH = 20
 
-class StockConsumer(WebsocketConsumer):
-    def connect(self):
-        async_to_sync(self.channel_layer.group_add)("market", self.channel_name)
-        self.accept()
 
-    def chat_message(self, event):
-        message = event["message"]
-        self.send(text_data=json.dumps(message))
+class StockConsumer(AsyncWebsocketConsumer):
+    """Streams quote updates for the symbols a client subscribed to.
+
+    Clients send ``{"action": "subscribe" | "unsubscribe", "symbols": [...]}``,
+    ``"*"`` subscribes to the whole market. Until then authenticated users get
+    the stocks they follow and anonymous clients get the whole market. Every
+    subscription is answered with a snapshot of the current quotes, unknown
+    symbols are dropped with an error.
+    """
+
+    async def connect(self):
+        self.subscriptions = set()
+        self.user = self.scope.get("user")
+        await self.accept()
+
+        if self.user is not None and self.user.is_authenticated:
+            await self.channel_layer.group_add(
+                user_group(self.user.pk), self.channel_name
+            )
+            symbols = await self.get_following_symbols()
+        else:
+            symbols = []
+        await self.subscribe(symbols or [ALL_SYMBOLS])
+
+    async def disconnect(self, code):
+        for symbol in self.subscriptions:
+            await self.channel_layer.group_discard(
+                self.get_group(symbol), self.channel_name
+            )
+        if self.user is not None and self.user.is_authenticated:
+            await self.channel_layer.group_discard(
+                user_group(self.user.pk), self.channel_name
+            )
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            content = loads(text_data or bytes_data)
+            action = content["action"]
+            symbols = [str(symbol) for symbol in content["symbols"]]
+        except (ValueError, TypeError, KeyError):
+            await self.send_error("Expected {action, symbols} message")
+            return
+
+        if action == "subscribe":
+            known = await self.get_known_symbols(symbols)
+            if len(known) < len(set(symbols)):
+                await self.send_error("Unknown symbols are ignored")
+            await self.subscribe(known)
+        elif action == "unsubscribe":
+            await self.unsubscribe(symbols)
+        else:
+            await self.send_error(f"Unknown action - {action}")
+
+    async def subscribe(self, symbols):
+        symbols = set(symbols)
+        # Market subscribers already get every symbol
+        if ALL_SYMBOLS in symbols:
+            await self.unsubscribe(self.subscriptions - {ALL_SYMBOLS}, notify=False)
+            symbols = {ALL_SYMBOLS}
+        elif ALL_SYMBOLS in self.subscriptions:
+            symbols = set()
+
+        added = set()
+        for symbol in symbols - self.subscriptions:
+            if len(self.subscriptions) >= MAX_SUBSCRIPTIONS:
+                await self.send_error(
+                    f"Subscription limit of {MAX_SUBSCRIPTIONS} reached"
+                )
+                break
+            await self.channel_layer.group_add(
+                self.get_group(symbol), self.channel_name
+            )
+            self.subscriptions.add(symbol)
+            added.add(symbol)
+        await self.send_subscriptions()
+
+        # Updates carry the snapshot sequence, so older ones can be dropped
+        if added:
+            snapshot = await database_sync_to_async(get_snapshot)(
+                None if ALL_SYMBOLS in added else added
+            )
+            await self.send(text_data=dumps(snapshot).decode("utf-8"))
+
+    async def unsubscribe(self, symbols, notify=True):
+        for symbol in set(symbols) & self.subscriptions:
+            await self.channel_layer.group_discard(
+                self.get_group(symbol), self.channel_name
+            )
+            self.subscriptions.discard(symbol)
+        if notify:
+            await self.send_subscriptions()
+
+    async def send_subscriptions(self):
+        await self.send(
+            text_data=dumps(
+                {"type": "subscribed", "symbols": sorted(self.subscriptions)}
+            ).decode("utf-8")
+        )
+
+    async def send_error(self, message):
+        await self.send(
+            text_data=dumps({"type": "error", "message": message}).decode("utf-8")
+        )
+
+    async def chat_message(self, event):
+        await self.send(text_data=event["text"])
+
+    async def stock_subscribe(self, event):
+        # Market subscribers get the message through the market group
+        if ALL_SYMBOLS in self.subscriptions:
+            return
+        await self.subscribe(event["symbols"])
+        await self.send(text_data=event["text"])
+
+    @staticmethod
+    def get_group(symbol):
+        return MARKET_GROUP if symbol == ALL_SYMBOLS else stock_group(symbol)
+
+    @database_sync_to_async
+    def get_known_symbols(self, symbols):
+        symbols = {symbol for symbol in symbols if len(symbol) <= MAX_SYMBOL_LENGTH}
+        known = StockData.objects.filter(symbol__in=symbols - {ALL_SYMBOLS})
+        return set(known.values_list("symbol", flat=True)) | (symbols & {ALL_SYMBOLS})
+
+    @database_sync_to_async
+    def get_following_symbols(self):
+        return list(self.user.following.values_list("symbol", flat=True))
@@ -0,0 +1,18 @@
+import orjson
+from rest_framework.utils.encoders import JSONEncoder
+
+_drf_encoder = JSONEncoder()
+
+
+def default(obj):
+    # Types orjson does not know natively (Decimal, lazy strings, querysets...)
+    return _drf_encoder.default(obj)
+
+
+def dumps(obj):
+    # DRF keys the errors of list items by their int index
+    return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def loads(data):
+    return orjson.loads(data)
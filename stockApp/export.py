@@ -0,0 +1,117 @@
+from django.db import connections
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from stockApp.models import CANDLE_FIELDS, StockData
+
+PRICE_FIELDS = ["open", "high", "low", "close"]
+
+EXPORT_SCHEMA = pa.schema(
+    [
+        ("symbol", pa.string()),
+        ("date", pa.date32()),
+        ("open", pa.float64()),
+        ("high", pa.float64()),
+        ("low", pa.float64()),
+        ("close", pa.float64()),
+        ("volume", pa.int64()),
+    ]
+)
+
+
+def export_schema(fields=CANDLE_FIELDS):
+    return pa.schema(
+        [EXPORT_SCHEMA.field(name) for name in ["symbol", "date", *fields]]
+    )
+
+
+def record_batches(bars, batch_size, fields=CANDLE_FIELDS):
+    """Read ``bars`` through a server-side cursor into fixed-size record batches.
+
+    Only one batch of rows is held in memory at a time and only the requested
+    ``fields`` are read. Rows skip the ORM converters: prices are read as the
+    stored integers and symbols as stock ids, both are converted a whole column
+    at a time.
+    """
+    symbols = dict(StockData.objects.values_list("id", "symbol"))
+    stock_ids = pa.array(list(symbols), type=pa.int64())
+    symbols = pa.array(list(symbols.values()), type=pa.string())
+    scale = bars.model._meta.get_field("close").scale
+
+    schema = export_schema(fields)
+
+    rows = bars.order_by("stock", "date").values_list("stock_id", "date", *fields)
+    sql, params = rows.query.sql_with_params()
+    with connections[rows.db].chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while chunk := cursor.fetchmany(batch_size):
+            stock_id, day, *values = zip(*chunk)
+            columns = [
+                symbols.take(pc.index_in(pa.array(stock_id), value_set=stock_ids)),
+                pa.array(day, type=pa.date32()),
+                *[
+                    (
+                        pc.divide(pa.array(value, type=pa.float64()), scale)
+                        if field in PRICE_FIELDS
+                        else pa.array(value, type=pa.int64())
+                    )
+                    for field, value in zip(fields, values)
+                ],
+            ]
+            yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def open_writer(sink, file_format, fields=CANDLE_FIELDS):
+    schema = export_schema(fields)
+    if file_format == "parquet":
+        return pq.ParquetWriter(sink, schema)
+    return pa.ipc.new_stream(sink, schema)
+
+
+def write_export(bars, sink, file_format, batch_size, fields=CANDLE_FIELDS):
+    """Write ``bars`` to ``sink`` as an Arrow IPC stream or Parquet file."""
+    rows = 0
+    with open_writer(sink, file_format, fields) as writer:
+        for batch in record_batches(bars, batch_size, fields):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+class ChunkSink:
+    """Write-only file collecting output until the response takes it."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_export(bars, file_format, batch_size, fields=CANDLE_FIELDS):
+    """Yield the export in pieces, one record batch after another."""
+    sink = ChunkSink()
+    with open_writer(pa.PythonFile(sink, mode="w"), file_format, fields) as writer:
+        for batch in record_batches(bars, batch_size, fields):
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
@@ -0,0 +1,57 @@
+from django.db import models
+
+
+class ScaledIntegerField(models.Field):
+    """Float stored exactly as a whole number of ``10 ** -decimal_places`` units.
+
+    Prices keep the precision they are quoted with, instead of picking up
+    binary floating point noise, and are read back as floats. The column is a
+    4-byte integer, four decimal places leave room for prices up to 214748.
+
+    Not being an ``IntegerField``, linear aggregates such as ``Avg`` and ``Sum``
+    keep this field as their output and are scaled back too, ``Variance`` is
+    not.
+    """
+
+    def __init__(self, *args, decimal_places=4, **kwargs):
+        self.decimal_places = decimal_places
+        super().__init__(*args, **kwargs)
+
+    @property
+    def scale(self):
+        return 10**self.decimal_places
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.decimal_places != 4:
+            kwargs["decimal_places"] = self.decimal_places
+        return name, path, args, kwargs
+
+    def fits(self, value):
+        """Whether ``value`` is a number the 4-byte column can hold once scaled."""
+        try:
+            return -(2**31) <= round(float(value) * self.scale) < 2**31
+        except (TypeError, ValueError, OverflowError):
+            return False
+
+    def get_internal_type(self):
+        return "IntegerField"
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, "resolve_expression"):
+            return value
+        return round(float(value) * self.scale)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        # Avg comes back as a Decimal
+        return float(value) / self.scale
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        return float(value)
+
+    def formfield(self, **kwargs):
+        return models.FloatField().formfield(**kwargs)
@@ -0,0 +1,121 @@
+import numpy as np
+
+SMA_WINDOWS = (20, 50)
+EMA_SPANS = (12, 26)
+RSI_PERIOD = 14
+BOLLINGER_WINDOW = 20
+BOLLINGER_WIDTH = 2
+VWAP_WINDOW = 20
+# Bars before the first new one needed by the rolling window indicators
+LOOKBACK = max(*SMA_WINDOWS, BOLLINGER_WINDOW, VWAP_WINDOW) - 1
+# EMA blocks are short enough for decay ** -size to stay well within float64
+EMA_BLOCK = 64
+
+
+def rolling_sum(values, window):
+    """Sum of the last ``window`` values at every position, NaN until full."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        cumsum = np.cumsum(np.concatenate(([0.0], values)))
+        out[window - 1 :] = cumsum[window:] - cumsum[:-window]
+    return out
+
+
+def sma(values, window):
+    return rolling_sum(values, window) / window
+
+
+def ema(values, alpha, seed):
+    """Exponential moving average continuing from ``seed``.
+
+    ``out[i] = decay ** (i + 1) * seed + alpha * sum(decay ** (i - j) * x[j])``
+    is evaluated with cumulative sums block by block instead of a Python loop.
+    """
+    out = np.empty(len(values))
+    decay = 1 - alpha
+    for start in range(0, len(values), EMA_BLOCK):
+        block = values[start : start + EMA_BLOCK]
+        powers = decay ** np.arange(len(block))
+        out[start : start + len(block)] = powers * (
+            decay * seed + alpha * np.cumsum(block / powers)
+        )
+        seed = out[start + len(block) - 1]
+    return out
+
+
+def wilder_averages(changes, state=None):
+    """RSI average gains and losses of every price change.
+
+    Without a previous ``state`` the first average is the mean of the first
+    ``RSI_PERIOD`` changes and earlier positions are NaN.
+    """
+    gains = np.clip(changes, 0, None)
+    losses = np.clip(-changes, 0, None)
+    avg_gain = np.full(len(changes), np.nan)
+    avg_loss = np.full(len(changes), np.nan)
+
+    start = 0
+    if state is None:
+        if len(changes) < RSI_PERIOD:
+            return avg_gain, avg_loss
+        start = RSI_PERIOD
+        state = (gains[:start].mean(), losses[:start].mean())
+        avg_gain[start - 1], avg_loss[start - 1] = state
+
+    alpha = 1 / RSI_PERIOD
+    avg_gain[start:] = ema(gains[start:], alpha, state[0])
+    avg_loss[start:] = ema(losses[start:], alpha, state[1])
+    return avg_gain, avg_loss
+
+
+def compute(close, high, low, volume, offset=0, state=None):
+    """Indicator columns of the bars from ``offset`` on.
+
+    Bars before ``offset`` only feed the rolling windows. ``state`` holds the
+    EMAs and RSI averages of the bar right before ``offset``, it is required
+    whenever ``offset`` is not 0.
+    """
+    columns = {}
+    for window in SMA_WINDOWS:
+        columns[f"sma_{window}"] = sma(close, window)
+
+    for span in EMA_SPANS:
+        seed = close[0] if state is None else state[f"ema_{span}"]
+        values = ema(close[offset:], 2 / (span + 1), seed)
+        columns[f"ema_{span}"] = np.concatenate((np.full(offset, np.nan), values))
+
+    if state is None:
+        changes = np.diff(close)
+        avg_gain, avg_loss = wilder_averages(changes)
+        # The first bar has no change
+        avg_gain = np.concatenate(([np.nan], avg_gain))
+        avg_loss = np.concatenate(([np.nan], avg_loss))
+    else:
+        changes = np.diff(close[offset - 1 :])
+        averages = wilder_averages(
+            changes, (state["rsi_avg_gain"], state["rsi_avg_loss"])
+        )
+        avg_gain, avg_loss = (
+            np.concatenate((np.full(offset, np.nan), values)) for values in averages
+        )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns["rsi_14"] = np.where(
+            avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss)
+        )
+    columns["rsi_14"][np.isnan(avg_gain)] = np.nan
+    columns["rsi_avg_gain"] = avg_gain
+    columns["rsi_avg_loss"] = avg_loss
+
+    middle = sma(close, BOLLINGER_WINDOW)
+    variance = sma(close**2, BOLLINGER_WINDOW) - middle**2
+    std = np.sqrt(np.clip(variance, 0, None))
+    columns["bollinger_upper"] = middle + BOLLINGER_WIDTH * std
+    columns["bollinger_lower"] = middle - BOLLINGER_WIDTH * std
+
+    typical = (high + low + close) / 3
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns["vwap_20"] = rolling_sum(typical * volume, VWAP_WINDOW) / rolling_sum(
+            volume, VWAP_WINDOW
+        )
+
+    return {name: values[offset:] for name, values in columns.items()}
@@ -0,0 +1,65 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+
+from stockApp.serializers import StockDataWithPricesSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare StockDataWithPricesSerializer with a plain DRF serializer"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = [
+            {
+                "symbol": f"S{i}",
+                "name": f"Stock {i}",
+                "exchange": "NASDAQ",
+                "type": "Common Stock",
+                "currency": "USD",
+                "country": "United States",
+                "open": 100.0 + i,
+                "high": 110.0 + i,
+                "low": 90.0 + i,
+                "close": 105.0 + i,
+                "volume": 100000.0 + i,
+                "change_percent": 0.5,
+                "volatility_30": 1.2,
+                "average_volume_30": 90000.0 + i,
+                "high_52w": 120.0 + i,
+                "low_52w": 80.0 + i,
+            }
+            for i in range(options["rows"])
+        ]
+        plain_serializer = type(
+            "PlainStockDataWithPricesSerializer",
+            (serializers.Serializer,),
+            {
+                name: field.__class__(*field._args, **field._kwargs)
+                for name, field in StockDataWithPricesSerializer._declared_fields.items()
+            },
+        )
+        assert plain_serializer(rows, many=True).data == (
+            StockDataWithPricesSerializer(rows, many=True).data
+        )
+
+        results = {}
+        for label, serializer in [
+            ("drf", plain_serializer),
+            ("fast", StockDataWithPricesSerializer),
+        ]:
+            seconds = min(
+                timeit.repeat(
+                    lambda: serializer(rows, many=True).data,
+                    number=1,
+                    repeat=options["repeat"],
+                )
+            )
+            results[label] = seconds
+            self.stdout.write(f"{label:>5}: {seconds * 1000:8.2f} ms")
+
+        self.stdout.write(f"speedup: {results['drf'] / results['fast']:.1f}x")
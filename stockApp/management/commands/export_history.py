@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stockApp.export import write_export
+from stockApp.models import CANDLE_FIELDS, StockTimeSeriesData
+
+
+class Command(BaseCommand):
+    help = "Export daily bars as an Arrow IPC stream or Parquet file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output")
+        parser.add_argument("--symbols", nargs="*")
+        parser.add_argument("--from", dest="start", type=date.fromisoformat)
+        parser.add_argument("--to", dest="end", type=date.fromisoformat)
+        parser.add_argument(
+            "--columns", nargs="+", choices=CANDLE_FIELDS, default=CANDLE_FIELDS
+        )
+        parser.add_argument("--format", choices=["arrow", "parquet"], default="parquet")
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        bars = StockTimeSeriesData.objects.all()
+        if options["symbols"]:
+            bars = bars.filter(stock__symbol__in=options["symbols"])
+        if options["start"]:
+            bars = bars.filter(date__gte=options["start"])
+        if options["end"]:
+            bars = bars.filter(date__lte=options["end"])
+
+        columns = [field for field in CANDLE_FIELDS if field in options["columns"]]
+        rows = write_export(
+            bars, options["output"], options["format"], options["batch_size"], columns
+        )
+        self.stdout.write(f"Exported {rows} bars to {options['output']}")
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stockApp", "0004_customuser_following"),
+    ]
+
+    operations = [
+        # Keep only the most recently written bar of every (stock, date) pair
+        migrations.RunSQL(
+            """
+            DELETE FROM "stockApp_stocktimeseriesdata" AS a
+            USING "stockApp_stocktimeseriesdata" AS b
+            WHERE a.stock_id = b.stock_id AND a.date = b.date AND a.id < b.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name="stocktimeseriesdata",
+            index=models.Index(
+                fields=["stock", "-date"], name="stock_time_series_date_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="stocktimeseriesdata",
+            constraint=models.UniqueConstraint(
+                fields=("stock", "date"), name="unique_stock_time_series_date"
+            ),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stockApp", "0005_stocktimeseriesdata_unique_stock_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LatestQuote",
+            fields=[
+                (
+                    "stock",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="stockApp.stockdata",
+                    ),
+                ),
+                ("symbol", models.CharField()),
+                ("name", models.CharField()),
+                ("exchange", models.CharField()),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[
+                            ("Closed-end Fund", "Closed End Fund"),
+                            ("Common Stock", "Common Stock"),
+                            ("Depositary Receipt", "Depositary Receipt"),
+                            ("ETF", "Etf"),
+                            ("Exchange-Traded Note", "Exchange Traded Note"),
+                            ("Global Depositary Receipt", "Global Depositary Receipt"),
+                            ("Limited Partnership", "Limited Partnership"),
+                            ("Mutual Fund", "Mutual Fund"),
+                            ("Preferred Stock", "Preferred Stock"),
+                            ("REIT", "Reit"),
+                            ("Right", "Right"),
+                            ("Structured Product", "Structured Product"),
+                            ("Trust", "Trust"),
+                            ("Unit", "Unit"),
+                            ("Warrant", "Warrant"),
+                        ]
+                    ),
+                ),
+                ("currency", models.CharField()),
+                ("country", models.CharField()),
+                ("open", models.FloatField()),
+                ("high", models.FloatField()),
+                ("low", models.FloatField()),
+                ("close", models.FloatField()),
+                ("volume", models.FloatField()),
+                ("date", models.DateField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-volume", "symbol"], name="latest_quote_volume_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO "stockApp_latestquote" (
+                stock_id, symbol, name, exchange, type, currency, country,
+                open, high, low, close, volume, date
+            )
+            SELECT DISTINCT ON (ts.stock_id)
+                ts.stock_id, s.symbol, s.name, s.exchange, s.type,
+                cur.name, c.name, ts.open, ts.high, ts.low, ts.close,
+                ts.volume, ts.date
+            FROM "stockApp_stocktimeseriesdata" ts
+            JOIN "stockApp_stockdata" s ON s.id = ts.stock_id
+            JOIN "stockApp_currency" cur ON cur.id = s.currency_id
+            JOIN "stockApp_country" c ON c.id = s.country_id
+            ORDER BY ts.stock_id, ts.date DESC
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
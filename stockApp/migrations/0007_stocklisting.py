@@ -0,0 +1,99 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:30
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.db.models.deletion
+import django.db.models.functions.text
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stockApp", "0006_latestquote"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name="StockListing",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("symbol", models.CharField()),
+                ("name", models.CharField()),
+                ("exchange", models.CharField()),
+                ("mic_code", models.CharField()),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[
+                            ("Closed-end Fund", "Closed End Fund"),
+                            ("Common Stock", "Common Stock"),
+                            ("Depositary Receipt", "Depositary Receipt"),
+                            ("ETF", "Etf"),
+                            ("Exchange-Traded Note", "Exchange Traded Note"),
+                            ("Global Depositary Receipt", "Global Depositary Receipt"),
+                            ("Limited Partnership", "Limited Partnership"),
+                            ("Mutual Fund", "Mutual Fund"),
+                            ("Preferred Stock", "Preferred Stock"),
+                            ("REIT", "Reit"),
+                            ("Right", "Right"),
+                            ("Structured Product", "Structured Product"),
+                            ("Trust", "Trust"),
+                            ("Unit", "Unit"),
+                            ("Warrant", "Warrant"),
+                        ]
+                    ),
+                ),
+                (
+                    "refreshed_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "country",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="stockApp.country",
+                    ),
+                ),
+                (
+                    "currency",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="stockApp.currency",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["symbol"],
+                        name="stock_listing_symbol_idx",
+                        opclasses=["text_pattern_ops"],
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(
+                        django.contrib.postgres.indexes.OpClass(
+                            django.db.models.functions.text.Upper("name"),
+                            name="gin_trgm_ops",
+                        ),
+                        name="stock_listing_name_trgm_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="stocklisting",
+            constraint=models.UniqueConstraint(
+                fields=("symbol", "exchange"), name="unique_stock_listing_symbol"
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stockApp", "0007_stocklisting"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockIndicator",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("sma_20", models.FloatField(null=True)),
+                ("sma_50", models.FloatField(null=True)),
+                ("ema_12", models.FloatField(null=True)),
+                ("ema_26", models.FloatField(null=True)),
+                ("rsi_14", models.FloatField(null=True)),
+                ("bollinger_upper", models.FloatField(null=True)),
+                ("bollinger_lower", models.FloatField(null=True)),
+                ("vwap_20", models.FloatField(null=True)),
+                ("rsi_avg_gain", models.FloatField(null=True)),
+                ("rsi_avg_loss", models.FloatField(null=True)),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="stockApp.stockdata",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["stock", "-date"], name="stock_indicator_date_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="stockindicator",
+            constraint=models.UniqueConstraint(
+                fields=("stock", "date"), name="unique_stock_indicator_date"
+            ),
+        ),
+    ]
@@ -0,0 +1,171 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:43
+
+import math
+from datetime import timedelta
+
+from django.db import migrations, models
+
+# Frozen copy of stockApp.stats as of this migration, so later changes to the
+# live statistics do not change what it computes
+STATS_ALPHA = 2 / (30 + 1)
+YEAR = timedelta(days=365)
+STATISTICS_FIELDS = [
+    "previous_close",
+    "previous_volatility_30",
+    "previous_average_volume_30",
+    "change_percent",
+    "volatility_30",
+    "average_volume_30",
+    "high_52w",
+    "high_52w_date",
+    "low_52w",
+    "low_52w_date",
+]
+
+
+def step(previous_close, previous_volatility, previous_average_volume, close, volume):
+    if not previous_close:
+        return 0.0, previous_volatility, float(volume)
+    change = (close / previous_close - 1) * 100
+    variance = (1 - STATS_ALPHA) * previous_volatility**2 + STATS_ALPHA * change**2
+    average_volume = (1 - STATS_ALPHA) * previous_average_volume + STATS_ALPHA * volume
+    return change, math.sqrt(variance), average_volume
+
+
+def from_history(bars):
+    previous_close = None
+    volatility = 0.0
+    average_volume = float(bars[0][4])
+    for date, high, low, close, volume in bars:
+        previous = (previous_close, volatility, average_volume)
+        change, volatility, average_volume = step(*previous, close, volume)
+        previous_close = close
+
+    # Ties keep the latest date, which leaves the 52-week window last
+    high_52w, high_52w_date = max((bar[1], bar[0]) for bar in bars)
+    low_52w, low_52w_date = min(
+        ((bar[2], bar[0]) for bar in bars),
+        key=lambda extreme: (extreme[0], -extreme[1].toordinal()),
+    )
+    return {
+        "previous_close": previous[0],
+        "previous_volatility_30": previous[1],
+        "previous_average_volume_30": previous[2],
+        "change_percent": change,
+        "volatility_30": volatility,
+        "average_volume_30": average_volume,
+        "high_52w": high_52w,
+        "high_52w_date": high_52w_date,
+        "low_52w": low_52w,
+        "low_52w_date": low_52w_date,
+    }
+
+
+def load_statistics(apps, schema_editor):
+    LatestQuote = apps.get_model("stockApp", "LatestQuote")
+    StockTimeSeriesData = apps.get_model("stockApp", "StockTimeSeriesData")
+
+    quotes = list(LatestQuote.objects.all())
+    for quote in quotes:
+        bars = StockTimeSeriesData.objects.filter(
+            stock_id=quote.stock_id,
+            date__gt=quote.date - YEAR,
+            date__lte=quote.date,
+        ).order_by("date")
+        year = list(bars.values_list("date", "high", "low", "close", "volume"))
+        for field, value in from_history(year).items():
+            setattr(quote, field, value)
+
+    LatestQuote.objects.bulk_update(quotes, STATISTICS_FIELDS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stockApp", "0008_stockindicator"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="latestquote",
+            name="average_volume_30",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="latestquote",
+            name="change_percent",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="latestquote",
+            name="high_52w",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="latestquote",
+            name="high_52w_date",
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name="latestquote",
+            name="low_52w",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="latestquote",
+            name="low_52w_date",
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name="latestquote",
+            name="previous_average_volume_30",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="latestquote",
+            name="previous_close",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name="latestquote",
+            name="previous_volatility_30",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="latestquote",
+            name="volatility_30",
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(load_statistics, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="latestquote",
+            index=models.Index(
+                fields=["change_percent", "symbol"], name="latest_quote_change_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="latestquote",
+            index=models.Index(
+                fields=["volatility_30", "symbol"], name="latest_quote_volatility_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="latestquote",
+            index=models.Index(
+                fields=["average_volume_30", "symbol"],
+                name="latest_quote_avg_volume_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="latestquote",
+            index=models.Index(
+                fields=["high_52w", "symbol"], name="latest_quote_high_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="latestquote",
+            index=models.Index(
+                fields=["low_52w", "symbol"], name="latest_quote_low_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.0.2 on 2026-10-18 14:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stockApp", "0009_latestquote_statistics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MarketBreadth",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(null=True)),
+                ("advancers", models.PositiveIntegerField(default=0)),
+                ("decliners", models.PositiveIntegerField(default=0)),
+                ("unchanged", models.PositiveIntegerField(default=0)),
+                ("refreshed_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MarketMover",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[
+                            ("gainers", "Gainers"),
+                            ("losers", "Losers"),
+                            ("volume", "Volume"),
+                        ]
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("symbol", models.CharField()),
+                ("name", models.CharField()),
+                ("close", models.FloatField()),
+                ("change_percent", models.FloatField()),
+                ("volume", models.FloatField()),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="stockApp.stockdata",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="marketmover",
+            constraint=models.UniqueConstraint(
+                fields=("metric", "rank"), name="unique_market_mover_rank"
+            ),
+        ),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:02
+
+from datetime import date
+
+from django.db import migrations
+from django.utils import timezone
+
+COLUMNS = '"id", "open", "high", "low", "close", "volume", "date", "stock_id"'
+
+
+def create_partitions(apps, schema_editor):
+    """Yearly partitions for the existing bars and up to the next year."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT EXTRACT(YEAR FROM MIN(date))::int, EXTRACT(YEAR FROM MAX(date))::int
+            FROM "stockApp_stocktimeseriesdata_unpartitioned"
+            """
+        )
+        first, last = cursor.fetchone()
+        current = timezone.now().year
+        first, last = min(first or current, current), max(last or current, current + 1)
+        for year in range(first, last + 1):
+            cursor.execute(
+                f'CREATE TABLE "stockApp_stocktimeseriesdata_y{year}" '
+                'PARTITION OF "stockApp_stocktimeseriesdata" '
+                "FOR VALUES FROM (%s) TO (%s)",
+                [date(year, 1, 1), date(year + 1, 1, 1)],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stockApp", "0010_marketmover_marketbreadth"),
+    ]
+
+    # The model state is unchanged, only the storage of the table is
+    operations = [
+        migrations.RunSQL(
+            """
+            ALTER TABLE "stockApp_stocktimeseriesdata"
+                RENAME TO "stockApp_stocktimeseriesdata_unpartitioned";
+            ALTER TABLE "stockApp_stocktimeseriesdata_unpartitioned"
+                DROP CONSTRAINT "unique_stock_time_series_date",
+                ALTER COLUMN "id" DROP IDENTITY;
+            DROP INDEX "stock_time_series_date_idx";
+            DROP INDEX "stockApp_stocktimeseriesdata_stock_id_ceb419ed";
+            """,
+            reverse_sql="""
+            ALTER TABLE "stockApp_stocktimeseriesdata_unpartitioned"
+                RENAME TO "stockApp_stocktimeseriesdata";
+            ALTER TABLE "stockApp_stocktimeseriesdata"
+                ALTER COLUMN "id" ADD GENERATED BY DEFAULT AS IDENTITY;
+            SELECT setval(
+                pg_get_serial_sequence('"stockApp_stocktimeseriesdata"', 'id'),
+                COALESCE(MAX("id"), 0) + 1,
+                false
+            ) FROM "stockApp_stocktimeseriesdata";
+            ALTER TABLE "stockApp_stocktimeseriesdata"
+                ADD CONSTRAINT "stockApp_stocktimese_stock_id_ceb419ed_fk_stockApp_"
+                FOREIGN KEY ("stock_id") REFERENCES "stockApp_stockdata" ("id")
+                DEFERRABLE INITIALLY DEFERRED;
+            CREATE INDEX "stockApp_stocktimeseriesdata_stock_id_ceb419ed"
+                ON "stockApp_stocktimeseriesdata" ("stock_id");
+            CREATE INDEX "stock_time_series_date_idx"
+                ON "stockApp_stocktimeseriesdata" ("stock_id", "date" DESC);
+            ALTER TABLE "stockApp_stocktimeseriesdata"
+                ADD CONSTRAINT "unique_stock_time_series_date"
+                UNIQUE ("stock_id", "date");
+            """,
+        ),
+        # Unique constraints of a partitioned table have to include the
+        # partition key, so the primary key becomes (id, date). Identity
+        # columns are not inherited by partitions before Postgres 17, a
+        # sequence default works for every version.
+        migrations.RunSQL(
+            """
+            CREATE SEQUENCE "stockApp_stocktimeseriesdata_id_seq";
+            CREATE TABLE "stockApp_stocktimeseriesdata" (
+                "id" bigint NOT NULL
+                    DEFAULT nextval('"stockApp_stocktimeseriesdata_id_seq"'),
+                "open" double precision NOT NULL,
+                "high" double precision NOT NULL,
+                "low" double precision NOT NULL,
+                "close" double precision NOT NULL,
+                "volume" double precision NOT NULL,
+                "date" date NOT NULL,
+                "stock_id" bigint NOT NULL,
+                PRIMARY KEY ("id", "date")
+            ) PARTITION BY RANGE ("date");
+            ALTER SEQUENCE "stockApp_stocktimeseriesdata_id_seq"
+                OWNED BY "stockApp_stocktimeseriesdata"."id";
+            ALTER TABLE "stockApp_stocktimeseriesdata"
+                ADD CONSTRAINT "stockApp_stocktimese_stock_id_ceb419ed_fk_stockApp_"
+                FOREIGN KEY ("stock_id") REFERENCES "stockApp_stockdata" ("id")
+                DEFERRABLE INITIALLY DEFERRED;
+            CREATE INDEX "stockApp_stocktimeseriesdata_stock_id_ceb419ed"
+                ON "stockApp_stocktimeseriesdata" ("stock_id");
+            CREATE INDEX "stock_time_series_date_idx"
+                ON "stockApp_stocktimeseriesdata" ("stock_id", "date" DESC);
+            ALTER TABLE "stockApp_stocktimeseriesdata"
+                ADD CONSTRAINT "unique_stock_time_series_date"
+                UNIQUE ("stock_id", "date");
+            """,
+            reverse_sql='DROP TABLE "stockApp_stocktimeseriesdata"',
+        ),
+        migrations.RunPython(create_partitions, migrations.RunPython.noop),
+        migrations.RunSQL(
+            f"""
+            INSERT INTO "stockApp_stocktimeseriesdata" ({COLUMNS})
+            SELECT {COLUMNS} FROM "stockApp_stocktimeseriesdata_unpartitioned";
+            SELECT setval(
+                '"stockApp_stocktimeseriesdata_id_seq"', COALESCE(MAX("id"), 0) + 1, false
+            ) FROM "stockApp_stocktimeseriesdata";
+            DROP TABLE "stockApp_stocktimeseriesdata_unpartitioned";
+            """,
+            reverse_sql=f"""
+            CREATE TABLE "stockApp_stocktimeseriesdata_unpartitioned" (
+                "id" bigint NOT NULL PRIMARY KEY,
+                "open" double precision NOT NULL,
+                "high" double precision NOT NULL,
+                "low" double precision NOT NULL,
+                "close" double precision NOT NULL,
+                "volume" double precision NOT NULL,
+                "date" date NOT NULL,
+                "stock_id" bigint NOT NULL
+            );
+            INSERT INTO "stockApp_stocktimeseriesdata_unpartitioned" ({COLUMNS})
+            SELECT {COLUMNS} FROM "stockApp_stocktimeseriesdata";
+            """,
+        ),
+    ]
@@ -0,0 +1,157 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:21
+
+from django.db import migrations, models, transaction
+
+import stockApp.fields
+
+BATCH_SIZE = 10000
+# ScaledIntegerField stores four decimal places
+SCALE = 10**4
+PRICES = ["open", "high", "low", "close"]
+# Converted columns are filled next to the old ones and renamed over them
+COLUMNS = [(price, f"{price}_scaled") for price in PRICES] + [
+    ("volume", "volume_integer")
+]
+
+CONVERT_SQL = f"""
+    UPDATE "stockApp_stocktimeseriesdata" SET
+        "open_scaled" = round("open" * {SCALE}),
+        "high_scaled" = round("high" * {SCALE}),
+        "low_scaled" = round("low" * {SCALE}),
+        "close_scaled" = round("close" * {SCALE}),
+        "volume_integer" = round("volume")
+"""
+
+# Bars inserted or re-written during the backfill, including ones whose batch
+# was already converted, keep the new columns in sync
+SYNC_SQL = f"""
+    CREATE FUNCTION "stockApp_stocktimeseriesdata_compact"() RETURNS trigger AS $$
+    BEGIN
+        NEW."open_scaled" := round(NEW."open" * {SCALE});
+        NEW."high_scaled" := round(NEW."high" * {SCALE});
+        NEW."low_scaled" := round(NEW."low" * {SCALE});
+        NEW."close_scaled" := round(NEW."close" * {SCALE});
+        NEW."volume_integer" := round(NEW."volume");
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    CREATE TRIGGER "stockApp_stocktimeseriesdata_compact"
+        BEFORE INSERT OR UPDATE OF "open", "high", "low", "close", "volume"
+        ON "stockApp_stocktimeseriesdata"
+        FOR EACH ROW EXECUTE FUNCTION "stockApp_stocktimeseriesdata_compact"();
+"""
+
+
+def convert_batches(apps, schema_editor):
+    """Fill the new columns in short transactions, the table stays writable."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT MIN("id"), MAX("id") FROM "stockApp_stocktimeseriesdata"'
+        )
+        first, last = cursor.fetchone()
+    if first is None:
+        return
+    for start in range(first, last + 1, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                CONVERT_SQL + 'WHERE "id" >= %s AND "id" < %s',
+                [start, start + BATCH_SIZE],
+            )
+
+
+def swap_columns(apps, schema_editor):
+    connection = schema_editor.connection
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            'LOCK TABLE "stockApp_stocktimeseriesdata" IN SHARE ROW EXCLUSIVE MODE'
+        )
+        cursor.execute(
+            'DROP TRIGGER "stockApp_stocktimeseriesdata_compact" '
+            'ON "stockApp_stocktimeseriesdata"'
+        )
+        cursor.execute('DROP FUNCTION "stockApp_stocktimeseriesdata_compact"()')
+        # SET NOT NULL fails the swap if any bar was left unconverted
+        for old, new in COLUMNS:
+            cursor.execute(
+                f'ALTER TABLE "stockApp_stocktimeseriesdata" DROP COLUMN "{old}"'
+            )
+            cursor.execute(
+                f'ALTER TABLE "stockApp_stocktimeseriesdata" '
+                f'RENAME COLUMN "{new}" TO "{old}"'
+            )
+            cursor.execute(
+                f'ALTER TABLE "stockApp_stocktimeseriesdata" '
+                f'ALTER COLUMN "{old}" SET NOT NULL'
+            )
+
+
+def restore_floats(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for price in PRICES:
+            cursor.execute(
+                f'ALTER TABLE "stockApp_stocktimeseriesdata" '
+                f'ALTER COLUMN "{price}" TYPE double precision '
+                f'USING "{price}"::float / {SCALE}'
+            )
+        cursor.execute(
+            'ALTER TABLE "stockApp_stocktimeseriesdata" '
+            'ALTER COLUMN "volume" TYPE double precision'
+        )
+
+
+class Migration(migrations.Migration):
+    # Every batch is committed on its own
+    atomic = False
+
+    dependencies = [
+        ("stockApp", "0011_partition_stocktimeseriesdata"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            ALTER TABLE "stockApp_stocktimeseriesdata"
+                ADD COLUMN "open_scaled" integer,
+                ADD COLUMN "high_scaled" integer,
+                ADD COLUMN "low_scaled" integer,
+                ADD COLUMN "close_scaled" integer,
+                ADD COLUMN "volume_integer" bigint;
+            """
+            + SYNC_SQL,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunPython(convert_batches, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(swap_columns, restore_floats),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="stocktimeseriesdata",
+                    name=name,
+                    field=stockApp.fields.ScaledIntegerField(),
+                )
+                for name in PRICES
+            ]
+            + [
+                migrations.AlterField(
+                    model_name="stocktimeseriesdata",
+                    name="volume",
+                    field=models.BigIntegerField(),
+                ),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="stocktimeseriesdata",
+            name="stock_time_series_date_idx",
+        ),
+        migrations.AddIndex(
+            model_name="stocktimeseriesdata",
+            index=models.Index(
+                fields=["stock", "-date"],
+                include=("close", "volume"),
+                name="stock_time_series_close_idx",
+            ),
+        ),
+    ]
@@ -1,6 +1,32 @@
+import math
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection, models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    Max,
+    Min,
+    Q,
+    RowRange,
+    Sum,
+    When,
+    Window,
+)
+from django.db.models.functions import FirstValue, LastValue, Trunc, Upper
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+import numpy as np
+
+from stockApp import indicators, stats
+from stockApp.fields import ScaledIntegerField
+from stockApp.partitions import ensure_yearly_partitions
+from stockApp.quotes import quotes_changed
 
 
 class CustomUserManager(BaseUserManager):
@@ -64,14 +90,619 @@ class StockData(models.Model):
         return f"{self.symbol} - {self.name}"
 
 
+CANDLE_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class StockTimeSeriesDataQuerySet(models.QuerySet):
+    def upsert(self, bars):
+        # Postgres refuses to update the same row twice in one statement
+        bars = list({(bar.stock_id, str(bar.date)): bar for bar in bars}.values())
+        ensure_yearly_partitions(
+            self.model, {parse_date(str(bar.date)).year for bar in bars}
+        )
+        with transaction.atomic():
+            bars = self.bulk_create(
+                bars,
+                update_conflicts=True,
+                unique_fields=["stock", "date"],
+                update_fields=["open", "high", "low", "close", "volume"],
+            )
+            first_dates = {}
+            for bar in bars:
+                date = parse_date(str(bar.date))
+                first_dates[bar.stock_id] = min(
+                    first_dates.get(bar.stock_id, date), date
+                )
+            LatestQuote.objects.refresh(set(first_dates), first_dates)
+        return bars
+
+    # How the bars of a week or month are folded into its candle
+    candle_aggregates = {
+        "open": FirstValue,
+        "high": Max,
+        "low": Min,
+        "close": LastValue,
+        "volume": Sum,
+    }
+
+    def candles(self, interval="day", fields=CANDLE_FIELDS):
+        """(date, *fields) bars in date order.
+
+        Weekly and monthly candles are aggregated by Postgres: every row gets
+        the values of its period from window functions and DISTINCT ON keeps
+        one row per stock and period. Daily close and volume reads are served
+        from the covering index alone.
+        """
+        if interval == "day":
+            return self.order_by("stock", "date").values_list("date", *fields)
+
+        period = Trunc("date", interval, output_field=models.DateField())
+        window = {
+            "partition_by": [F("stock"), period],
+            "order_by": F("date").asc(),
+            "frame": RowRange(start=None, end=None),
+        }
+        aggregates = {
+            f"period_{field}": Window(self.candle_aggregates[field](field), **window)
+            for field in fields
+        }
+        return (
+            self.annotate(period=period, **aggregates)
+            .order_by("stock", "period")
+            .distinct("stock", "period")
+            .values_list("period", *aggregates)
+        )
+
+
 class StockTimeSeriesData(models.Model):
+    """Daily bars, range partitioned by year in Postgres.
+
+    The primary key is (id, date) in the database, partitions are created
+    by upserts and ahead of time by ``create_time_series_partitions``. Prices
+    are kept exactly as scaled integers and volume as a whole number.
+    """
+
     stock = models.ForeignKey(StockData, on_delete=models.CASCADE)
+    open = ScaledIntegerField()
+    high = ScaledIntegerField()
+    low = ScaledIntegerField()
+    close = ScaledIntegerField()
+    volume = models.BigIntegerField()
+    date = models.DateField()
+
+    objects = StockTimeSeriesDataQuerySet.as_manager()
+
+    def fits(self):
+        """Whether every price can be stored in its scaled integer column."""
+        return all(
+            field.fits(getattr(self, field.attname))
+            for field in self._meta.concrete_fields
+            if isinstance(field, ScaledIntegerField)
+        )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["stock", "date"], name="unique_stock_time_series_date"
+            ),
+        ]
+        indexes = [
+            # Price lists and charts only read close and volume
+            models.Index(
+                fields=["stock", "-date"],
+                include=["close", "volume"],
+                name="stock_time_series_close_idx",
+            ),
+        ]
+
+
+class LatestQuoteQuerySet(models.QuerySet):
+    def refresh(self, stock_ids, first_dates=None):
+        """Rebuild the quotes of stocks whose bars were written.
+
+        ``first_dates`` maps stocks to the oldest bar written, it tells whether
+        the statistics can be rolled forward from the current quote.
+        """
+        if not stock_ids:
+            return []
+
+        # Only the columns copied into the quotes are read
+        latest_bars = (
+            StockTimeSeriesData.objects.filter(stock_id__in=stock_ids)
+            .select_related("stock__currency", "stock__country")
+            .only(
+                "stock",
+                "date",
+                *CANDLE_FIELDS,
+                "stock__symbol",
+                "stock__name",
+                "stock__exchange",
+                "stock__type",
+                "stock__currency__name",
+                "stock__country__name",
+            )
+            .order_by("stock_id", "-date")
+            .distinct("stock_id")
+        )
+        quotes = []
+        for bar in latest_bars:
+            bar.stock.last_time_series_update = bar.date
+            quotes.append(
+                LatestQuote(
+                    stock=bar.stock,
+                    symbol=bar.stock.symbol,
+                    name=bar.stock.name,
+                    exchange=bar.stock.exchange,
+                    type=bar.stock.type,
+                    currency=bar.stock.currency.name,
+                    country=bar.stock.country.name,
+                    open=bar.open,
+                    high=bar.high,
+                    low=bar.low,
+                    close=bar.close,
+                    volume=bar.volume,
+                    date=bar.date,
+                )
+            )
+
+        current = self.in_bulk(stock_ids)
+        first_dates = first_dates or {}
+        stale = [
+            quote
+            for quote in quotes
+            if not quote.roll_statistics(
+                current.get(quote.stock_id), first_dates.get(quote.stock_id)
+            )
+        ]
+        self.load_statistics(stale)
+
+        # Re-written bars that did not change the quote are not propagated
+        fields = LatestQuote.update_fields()
+        quotes = [
+            quote
+            for quote in quotes
+            if quote.stock_id not in current
+            or any(
+                getattr(current[quote.stock_id], field) != getattr(quote, field)
+                for field in fields
+            )
+        ]
+        if not quotes:
+            return []
+
+        StockData.objects.bulk_update(
+            [quote.stock for quote in quotes], ["last_time_series_update"]
+        )
+        quotes = self.bulk_create(
+            quotes, update_conflicts=True, unique_fields=["stock"], update_fields=fields
+        )
+        transaction.on_commit(partial(quotes_changed, quotes))
+        return quotes
+
+    def load_statistics(self, quotes):
+        """Compute statistics of ``quotes`` from the last 52 weeks of bars."""
+        if not quotes:
+            return
+
+        bars = {}
+        for stock_id, *bar in (
+            StockTimeSeriesData.objects.filter(
+                stock_id__in=[quote.stock_id for quote in quotes],
+                date__gt=min(quote.date for quote in quotes) - stats.YEAR,
+            )
+            .order_by("stock_id", "date")
+            .values_list("stock_id", "date", "high", "low", "close", "volume")
+        ):
+            bars.setdefault(stock_id, []).append(bar)
+
+        for quote in quotes:
+            year = [
+                bar
+                for bar in bars[quote.stock_id]
+                if quote.date - stats.YEAR < bar[0] <= quote.date
+            ]
+            for field, value in stats.from_history(year).items():
+                setattr(quote, field, value)
+
+
+class LatestQuote(models.Model):
+    """Latest bar of every stock, denormalized so price lists need no joins."""
+
+    stock = models.OneToOneField(StockData, on_delete=models.CASCADE, primary_key=True)
+    symbol = models.CharField()
+    name = models.CharField()
+    exchange = models.CharField()
+    type = models.CharField(choices=StockData.StockType)
+    currency = models.CharField()
+    country = models.CharField()
     open = models.FloatField()
     high = models.FloatField()
     low = models.FloatField()
     close = models.FloatField()
     volume = models.FloatField()
     date = models.DateField()
+    change_percent = models.FloatField(default=0)
+    volatility_30 = models.FloatField(default=0)
+    average_volume_30 = models.FloatField(default=0)
+    high_52w = models.FloatField(default=0)
+    high_52w_date = models.DateField(null=True)
+    low_52w = models.FloatField(default=0)
+    low_52w_date = models.DateField(null=True)
+    # Statistics as of the previous bar, the current ones are rolled from them
+    previous_close = models.FloatField(null=True)
+    previous_volatility_30 = models.FloatField(default=0)
+    previous_average_volume_30 = models.FloatField(default=0)
+
+    objects = LatestQuoteQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-volume", "symbol"], name="latest_quote_volume_idx"),
+            # Scanned forwards or backwards by StockPricesPagination orderings
+            models.Index(
+                fields=["change_percent", "symbol"], name="latest_quote_change_idx"
+            ),
+            models.Index(
+                fields=["volatility_30", "symbol"],
+                name="latest_quote_volatility_idx",
+            ),
+            models.Index(
+                fields=["average_volume_30", "symbol"],
+                name="latest_quote_avg_volume_idx",
+            ),
+            models.Index(fields=["high_52w", "symbol"], name="latest_quote_high_idx"),
+            models.Index(fields=["low_52w", "symbol"], name="latest_quote_low_idx"),
+        ]
+
+    @classmethod
+    def update_fields(cls):
+        return [
+            field.name for field in cls._meta.concrete_fields if not field.primary_key
+        ]
+
+    def roll_statistics(self, previous, first_date=None):
+        """Update the statistics from ``previous``, the current quote, in O(1).
+
+        Returns False when they have to be loaded from history instead: for
+        the first quote of a stock, after older or several bars were written
+        and when a 52-week extreme left the window or was revised away.
+        """
+        if previous is None or self.date < previous.date:
+            return False
+        if first_date is not None and first_date < self.date:
+            return False
+
+        extreme_dates = (previous.high_52w_date, previous.low_52w_date)
+        if None in extreme_dates or min(extreme_dates) <= self.date - stats.YEAR:
+            return False
+        if self.date == previous.date:
+            # The bar was re-written, roll again from the bar before it
+            if (
+                previous.high_52w_date == self.date
+                and self.high < previous.high_52w
+                or previous.low_52w_date == self.date
+                and self.low > previous.low_52w
+            ):
+                return False
+            self.previous_close = previous.previous_close
+            self.previous_volatility_30 = previous.previous_volatility_30
+            self.previous_average_volume_30 = previous.previous_average_volume_30
+        else:
+            self.previous_close = previous.close
+            self.previous_volatility_30 = previous.volatility_30
+            self.previous_average_volume_30 = previous.average_volume_30
+
+        self.change_percent, self.volatility_30, self.average_volume_30 = stats.step(
+            self.previous_close,
+            self.previous_volatility_30,
+            self.previous_average_volume_30,
+            self.close,
+            self.volume,
+        )
+        self.high_52w, self.high_52w_date = stats.highest(
+            (previous.high_52w, previous.high_52w_date), (self.high, self.date)
+        )
+        self.low_52w, self.low_52w_date = stats.lowest(
+            (previous.low_52w, previous.low_52w_date), (self.low, self.date)
+        )
+        return True
+
+
+class MarketMoverQuerySet(models.QuerySet):
+    def refresh(self):
+        """Rebuild the top movers and breadth from quotes of the last market day.
+
+        Runs after every ingestion wave, so endpoints polled by dashboards read
+        a few ranked rows instead of sorting every quote per request. Rebuilds
+        of overlapping waves wait for each other: a DELETE does not see the
+        rows another rebuild has yet to commit, and its ranks would collide.
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_xact_lock(hashtext(%s))",
+                    [self.model._meta.db_table],
+                )
+            latest = LatestQuote.objects.aggregate(date=Max("date"))["date"]
+            quotes = LatestQuote.objects.filter(date=latest)
+
+            movers = []
+            for metric, (condition, ordering) in MarketMover.rankings.items():
+                ranked = quotes.filter(condition).order_by(*ordering)
+                for rank, quote in enumerate(ranked[: settings.MARKET_MOVERS_SIZE], 1):
+                    movers.append(
+                        MarketMover(
+                            metric=metric,
+                            rank=rank,
+                            stock_id=quote.stock_id,
+                            symbol=quote.symbol,
+                            name=quote.name,
+                            close=quote.close,
+                            change_percent=quote.change_percent,
+                            volume=quote.volume,
+                        )
+                    )
+            breadth = quotes.aggregate(
+                advancers=Count("pk", filter=Q(change_percent__gt=0)),
+                decliners=Count("pk", filter=Q(change_percent__lt=0)),
+                unchanged=Count("pk", filter=Q(change_percent=0)),
+            )
+
+            self.all().delete()
+            self.bulk_create(movers)
+            MarketBreadth.objects.update_or_create(
+                pk=MarketBreadth.SINGLETON_ID, defaults={"date": latest, **breadth}
+            )
+        return movers
+
+
+class MarketMover(models.Model):
+    """Top ranked quotes of every metric, refreshed after each ingestion."""
+
+    class Metric(models.TextChoices):
+        GAINERS = "gainers"
+        LOSERS = "losers"
+        VOLUME = "volume"
+
+    metric = models.CharField(choices=Metric)
+    rank = models.PositiveSmallIntegerField()
+    stock = models.ForeignKey(StockData, on_delete=models.CASCADE)
+    symbol = models.CharField()
+    name = models.CharField()
+    close = models.FloatField()
+    change_percent = models.FloatField()
+    volume = models.FloatField()
+
+    objects = MarketMoverQuerySet.as_manager()
+
+    # Orderings match the LatestQuote indexes
+    rankings = {
+        Metric.GAINERS: (Q(change_percent__gt=0), ("-change_percent", "-symbol")),
+        Metric.LOSERS: (Q(change_percent__lt=0), ("change_percent", "symbol")),
+        Metric.VOLUME: (Q(), ("-volume", "symbol")),
+    }
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["metric", "rank"], name="unique_market_mover_rank"
+            ),
+        ]
+
+
+class MarketBreadth(models.Model):
+    """Advancing, declining and unchanged stocks of the last market day."""
+
+    SINGLETON_ID = 1
+
+    date = models.DateField(null=True)
+    advancers = models.PositiveIntegerField(default=0)
+    decliners = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+
+class StockIndicatorQuerySet(models.QuerySet):
+    def refresh(self, stock_id, full=False, since=None):
+        """Compute the indicators of the bars of a stock written since ``since``.
+
+        Only those bars and the ``LOOKBACK`` bars before them are loaded, the
+        EMAs and RSI averages continue from the stored row before them.
+        Without ``since`` the new bars and the latest stored one are computed,
+        as upserts revise the latest bar. ``full`` recomputes the whole
+        history.
+        """
+        bars = StockTimeSeriesData.objects.filter(stock_id=stock_id)
+        last = None
+        if not full:
+            stored = self.filter(stock_id=stock_id).order_by("-date")
+            if since is None:
+                last = next(iter(stored[1:2]), None)
+            else:
+                last = stored.filter(date__lt=since).first()
+        # Short histories have no RSI state to continue from yet
+        if last is None or last.rsi_avg_gain is None:
+            return self.compute(stock_id, bars)
+
+        new_bars = bars.filter(date__gt=last.date)
+        if not new_bars.exists():
+            return 0
+        lookback = list(
+            bars.filter(date__lte=last.date)
+            .order_by("-date")
+            .values_list(*StockIndicator.bar_fields)[: indicators.LOOKBACK]
+        )
+        lookback.reverse()
+        if not lookback:
+            return self.compute(stock_id, bars)
+        return self.compute(stock_id, new_bars, lookback, last)
+
+    def compute(self, stock_id, bars, lookback=(), last=None):
+        rows = list(lookback) + list(
+            bars.order_by("date").values_list(*StockIndicator.bar_fields)
+        )
+        if len(rows) == len(lookback):
+            return 0
+
+        dates, close, high, low, volume = zip(*rows)
+        state = None
+        if last is not None:
+            state = {
+                field: getattr(last, field) for field in StockIndicator.state_fields
+            }
+        columns = indicators.compute(
+            np.array(close, dtype=float),
+            np.array(high, dtype=float),
+            np.array(low, dtype=float),
+            np.array(volume, dtype=float),
+            offset=len(lookback),
+            state=state,
+        )
+
+        fields = StockIndicator.indicator_fields()
+        values = zip(*(columns[field].tolist() for field in fields))
+        rows = [
+            StockIndicator(
+                stock_id=stock_id,
+                date=date,
+                # NaN marks a window that is not full yet
+                **{
+                    field: None if math.isnan(value) else value
+                    for field, value in zip(fields, row)
+                },
+            )
+            for date, row in zip(dates[len(lookback) :], values)
+        ]
+        self.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["stock", "date"],
+            update_fields=fields,
+            batch_size=1000,
+        )
+        return len(rows)
+
+
+class StockIndicator(models.Model):
+    """Technical indicators of a stock at the close of every bar."""
+
+    stock = models.ForeignKey(StockData, on_delete=models.CASCADE)
+    date = models.DateField()
+    sma_20 = models.FloatField(null=True)
+    sma_50 = models.FloatField(null=True)
+    ema_12 = models.FloatField(null=True)
+    ema_26 = models.FloatField(null=True)
+    rsi_14 = models.FloatField(null=True)
+    bollinger_upper = models.FloatField(null=True)
+    bollinger_lower = models.FloatField(null=True)
+    vwap_20 = models.FloatField(null=True)
+    # Wilder averages the next RSI continues from
+    rsi_avg_gain = models.FloatField(null=True)
+    rsi_avg_loss = models.FloatField(null=True)
+
+    objects = StockIndicatorQuerySet.as_manager()
+
+    bar_fields = ["date", "close", "high", "low", "volume"]
+    state_fields = ["ema_12", "ema_26", "rsi_avg_gain", "rsi_avg_loss"]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["stock", "date"], name="unique_stock_indicator_date"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["stock", "-date"], name="stock_indicator_date_idx"),
+        ]
+
+    @classmethod
+    def indicator_fields(cls):
+        return [
+            field.name
+            for field in cls._meta.concrete_fields
+            if field.name not in ("id", "stock", "date")
+        ]
+
+
+class StockListingQuerySet(models.QuerySet):
+    def listed(self, country, exchange, type, currency):
+        return self.filter(
+            country__name=country,
+            exchange=exchange,
+            type=type,
+            currency__name=currency,
+        )
+
+    def search(self, query):
+        """Listings whose symbol starts with or whose name contains ``query``.
+
+        Exact symbol matches come first, then symbol prefixes and then names
+        ordered by trigram similarity.
+        """
+        symbol = query.upper()
+        return (
+            self.filter(Q(symbol__startswith=symbol) | Q(name__icontains=query))
+            .annotate(
+                rank=Case(
+                    When(symbol=symbol, then=0),
+                    When(symbol__startswith=symbol, then=1),
+                    default=2,
+                ),
+                similarity=TrigramSimilarity("name", query),
+            )
+            .order_by("rank", "-similarity", "symbol")
+        )
+
+
+class StockListing(models.Model):
+    """Local copy of every instrument listed by the TwelveData ``/stocks``."""
+
+    symbol = models.CharField()
+    name = models.CharField()
+    exchange = models.CharField()
+    mic_code = models.CharField()
+    type = models.CharField(choices=StockData.StockType)
+    currency = models.ForeignKey(Currency, on_delete=models.PROTECT)
+    country = models.ForeignKey(Country, on_delete=models.PROTECT)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    objects = StockListingQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["symbol", "exchange"], name="unique_stock_listing_symbol"
+            ),
+        ]
+        indexes = [
+            # Symbol prefix lookups (LIKE 'AB%') regardless of the collation
+            models.Index(
+                fields=["symbol"],
+                opclasses=["text_pattern_ops"],
+                name="stock_listing_symbol_idx",
+            ),
+            # Backs the UPPER(name) LIKE used by name__icontains
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="stock_listing_name_trgm_idx",
+            ),
+        ]
+
+    def to_stock_data(self):
+        return StockData(
+            symbol=self.symbol,
+            name=self.name,
+            exchange=self.exchange,
+            type=self.type,
+            currency_id=self.currency_id,
+            country_id=self.country_id,
+        )
+
+    def promote(self):
+        """Start tracking the listing, a single insert into ``StockData``."""
+        stock = self.to_stock_data()
+        stock.save(force_insert=True)
+        return stock
 
 
 class CustomUser(AbstractBaseUser):
@@ -93,6 +724,43 @@ class CustomUser(AbstractBaseUser):
     def __str__(self):
         return self.email
 
+    def follow(self, stock_ids):
+        """Follow the stocks not followed yet with one insert, return their ids."""
+        Following = self.following.through
+        with transaction.atomic():
+            followed = set(
+                self.following.filter(pk__in=stock_ids).values_list("pk", flat=True)
+            )
+            added = sorted(set(stock_ids) - followed)
+            Following.objects.bulk_create(
+                [
+                    Following(customuser=self, stockdata_id=stock_id)
+                    for stock_id in added
+                ],
+                ignore_conflicts=True,
+            )
+        return added
+
+    def unfollow(self, stock_ids):
+        """Stop following the stocks with one delete, return how many were."""
+        Following = self.following.through
+        removed, _ = Following.objects.filter(
+            customuser=self, stockdata_id__in=stock_ids
+        ).delete()
+        return removed
+
+    def set_following(self, stock_ids):
+        """Replace the followed stocks, return the added ids and removed count."""
+        Following = self.following.through
+        with transaction.atomic():
+            removed, _ = (
+                Following.objects.filter(customuser=self)
+                .exclude(stockdata_id__in=stock_ids)
+                .delete()
+            )
+            added = self.follow(stock_ids)
+        return added, removed
+
     def has_perm(self, perm, obj=None):
         return self.is_active
 
@@ -0,0 +1,163 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on the full ``ordering`` tuple.
+
+    Unlike ``CursorPagination`` the cursor stores the values of every ordering
+    field, so pages stay constant time even when the first field has many ties.
+    Total count can be skipped with ``?count=false``.
+    """
+
+    ordering = ()
+    ordering_fields = ()
+    ordering_query_param = "ordering"
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        position, reverse = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) != "false":
+            self.count = queryset.count()
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.reverse_field(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            # Values of a crafted cursor only fail once the lookups are built
+            try:
+                queryset = queryset.filter(self.seek_filter(ordering, position))
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results and (has_more or reverse):
+            self.next_position = self.get_position(results[-1])
+        if results and (has_more if reverse else position is not None):
+            self.previous_position = self.get_position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        response = {}
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_link(self.next_position, reverse=False)
+        response["previous"] = self.get_link(self.previous_position, reverse=True)
+        response["results"] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "example": 123},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_ordering(self, request):
+        """``?ordering=[-]field`` of ``ordering_fields`` or the default ordering.
+
+        Ties are broken on the last default field in the direction of the
+        requested one, so a single (field, tie-breaker) index serves both.
+        """
+        default = type(self).ordering
+        field = request.query_params.get(self.ordering_query_param, "")
+        if field.lstrip("-") not in self.ordering_fields:
+            return default
+        tie_breaker = default[-1].lstrip("-")
+        if field.startswith("-"):
+            tie_breaker = f"-{tie_breaker}"
+        return (field, tie_breaker)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            position, reverse = cursor["p"], bool(cursor["r"])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        cursor = json.dumps({"p": position, "r": reverse}, separators=(",", ":"))
+        encoded = base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_position(self, row):
+        fields = [field.lstrip("-") for field in self.ordering]
+        if isinstance(row, dict):
+            return [row[field] for field in fields]
+        return [getattr(row, field) for field in fields]
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def seek_filter(ordering, position):
+        # (a, b) > (x, y) expanded as a > x OR (a = x AND b > y), honouring
+        # the direction of every ordering field
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+
+class StockPricesPagination(KeysetPagination):
+    ordering = ("-volume", "symbol")
+    ordering_fields = (
+        "change_percent",
+        "volatility_30",
+        "average_volume_30",
+        "high_52w",
+        "low_52w",
+    )
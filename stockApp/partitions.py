@@ -0,0 +1,90 @@
+from datetime import date
+
+from django.db import IntegrityError, ProgrammingError, connection, transaction
+
+# Partition years each process has seen committed, per table
+_known_years = {}
+
+
+def partition_name(model, year):
+    return f"{model._meta.db_table}_y{year}"
+
+
+def yearly_partitions(model):
+    """Years of the existing partitions of a table range partitioned by date."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [model._meta.db_table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f"{model._meta.db_table}_y"
+    return {int(name[len(prefix) :]) for name in names if name.startswith(prefix)}
+
+
+def create_yearly_partitions(model, years):
+    """Create the missing partitions for ``years``, return the years created.
+
+    Creating a partition locks the parent table, so callers writing rows
+    only pay for it the first time a year shows up.
+    """
+    missing = sorted(set(years) - yearly_partitions(model))
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for year in missing:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote_name(partition_name(model, year))} "
+                f"PARTITION OF {quote_name(model._meta.db_table)} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                [date(year, 1, 1), date(year + 1, 1, 1)],
+            )
+    return missing
+
+
+def ensure_yearly_partitions(model, years):
+    """Make sure the partitions of ``years`` exist before rows are written.
+
+    Years this process has already seen cost no query, so writers only touch
+    the catalog the first time a year shows up. Call it outside the write
+    transaction, creating a partition locks the parent table.
+    """
+    table = model._meta.db_table
+    years = set(years)
+    if years <= _known_years.get(table, set()):
+        return
+    try:
+        with transaction.atomic():
+            create_yearly_partitions(model, years)
+    except (IntegrityError, ProgrammingError):
+        # Another writer created the same partition first
+        pass
+    # Partitions created inside a transaction vanish with its rollback
+    if not connection.in_atomic_block:
+        _known_years.setdefault(table, set()).update(yearly_partitions(model))
+
+
+def detach_yearly_partition(model, year, drop=False):
+    """Detach the partition of ``year`` from its table in constant time.
+
+    The detached table keeps its rows, so it can be archived with ``pg_dump
+    -t`` before it is dropped, instead of running a long DELETE. Other
+    processes keep the year as known, bars of detached years are not written.
+    """
+    _known_years.get(model._meta.db_table, set()).discard(year)
+    if year not in yearly_partitions(model):
+        return False
+    quote_name = connection.ops.quote_name
+    name = quote_name(partition_name(model, year))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {quote_name(model._meta.db_table)} DETACH PARTITION {name}"
+        )
+        if drop:
+            cursor.execute(f"DROP TABLE {name}")
+    return True
@@ -0,0 +1,63 @@
+from stockApp.broadcast import publish_updates
+from stockApp.cache import bump_quotes_version
+from stockApp.encoders import dumps, loads
+from stockApp.store import get_redis
+
+QUOTES_KEY = "quotes"
+SEQUENCE_KEY = "quotes:seq"
+
+
+def quote_message(quote):
+    return {
+        "symbol": quote.symbol,
+        "price": quote.close,
+        "volume": quote.volume,
+        "date": quote.date,
+    }
+
+
+def store_quotes(quotes):
+    """Save compact quotes under a new sequence number and return them."""
+    redis = get_redis()
+    seq = redis.incr(SEQUENCE_KEY)
+    messages = {quote.symbol: {**quote_message(quote), "seq": seq} for quote in quotes}
+    if messages:
+        redis.hset(
+            QUOTES_KEY,
+            mapping={symbol: dumps(message) for symbol, message in messages.items()},
+        )
+    return messages
+
+
+def warm_quotes():
+    from stockApp.models import LatestQuote
+
+    store_quotes(LatestQuote.objects.all())
+
+
+def get_snapshot(symbols=None):
+    redis = get_redis()
+    if not redis.exists(SEQUENCE_KEY):
+        warm_quotes()
+
+    pipe = redis.pipeline()
+    pipe.get(SEQUENCE_KEY)
+    if symbols is None:
+        pipe.hvals(QUOTES_KEY)
+    else:
+        pipe.hmget(QUOTES_KEY, sorted(symbols))
+    seq, values = pipe.execute()
+
+    return {
+        "type": "snapshot",
+        "seq": int(seq or 0),
+        "quotes": [loads(value) for value in values if value is not None],
+    }
+
+
+def quotes_changed(quotes):
+    bump_quotes_version()
+    messages = store_quotes(quotes)
+    publish_updates(
+        {symbol: {"type": "update", **message} for symbol, message in messages.items()}
+    )
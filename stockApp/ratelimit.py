@@ -0,0 +1,67 @@
+import time
+
+from stockApp.store import get_redis
+
+
+class TokenBucket:
+    """Token bucket used to pace TwelveData API credit spend.
+
+    Instead of blocking, ``reserve`` returns the number of seconds the caller
+    has to wait before the reserved tokens become available, so it can be used
+    as a Celery ``countdown``.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def reserve(self, tokens=1):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        self.tokens -= tokens
+
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RedisTokenBucket:
+    """Token bucket shared by every process through Redis.
+
+    Same ``reserve`` contract as ``TokenBucket``, the state lives in a Redis
+    hash updated atomically by a Lua script.
+    """
+
+    script = """
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local tokens = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local state = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+    local available = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - updated_at) * rate)
+    available = available - tokens
+    redis.call("HSET", KEYS[1], "tokens", available, "updated_at", now)
+    redis.call("EXPIRE", KEYS[1], math.ceil((capacity - available) / rate) + 1)
+    if available >= 0 then
+        return "0"
+    end
+    return tostring(-available / rate)
+    """
+
+    def __init__(self, key, rate, capacity):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+
+    def reserve(self, tokens=1):
+        wait = get_redis().eval(
+            self.script, 1, self.key, self.rate, self.capacity, tokens, time.time()
+        )
+        return float(wait)
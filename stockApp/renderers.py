@@ -0,0 +1,78 @@
+import csv
+import io
+from abc import ABC, abstractmethod
+from itertools import islice
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+from stockApp.encoders import dumps
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(data)
+
+
+class StreamingRenderer(BaseRenderer):
+    """Format the view writes itself into a ``StreamingHttpResponse``.
+
+    DRF only uses these for content negotiation, errors are rendered as JSON.
+    """
+
+    charset = None
+    render_style = "binary"
+
+
+class RowStreamRenderer(StreamingRenderer, ABC):
+    def stream(self, columns, rows):
+        """Yield the encoded ``rows`` tuples, a chunk of lines at a time."""
+        rows = iter(rows)
+        yield self.encode_header(columns)
+        while chunk := list(islice(rows, settings.STREAM_CHUNK_SIZE)):
+            yield self.encode_rows(columns, chunk)
+
+    def encode_header(self, columns):
+        return b""
+
+    @abstractmethod
+    def encode_rows(self, columns, rows):
+        """Encode a chunk of ``rows`` tuples, each ending with a newline."""
+
+
+class NDJSONRenderer(RowStreamRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def encode_rows(self, columns, rows):
+        return b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+class CSVRenderer(RowStreamRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def encode_header(self, columns):
+        return self.encode_rows(columns, [columns])
+
+    def encode_rows(self, columns, rows):
+        lines = io.StringIO()
+        csv.writer(lines).writerows(rows)
+        return lines.getvalue().encode("utf-8")
+
+
+class ArrowStreamRenderer(StreamingRenderer):
+    media_type = "application/vnd.apache.arrow.stream"
+    format = "arrow"
+
+
+class ParquetRenderer(StreamingRenderer):
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
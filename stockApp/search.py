@@ -0,0 +1,90 @@
+import re
+from bisect import bisect_left
+
+from stockApp.cache import get_stocks_version
+
+WORD_RE = re.compile(r"[A-Z0-9]+")
+
+search_fields = ["id", "symbol", "name", "exchange", "type", "currency"]
+
+_index = None
+_index_version = None
+
+
+def split_words(text):
+    return WORD_RE.findall(text.upper())
+
+
+class SymbolIndex:
+    """Sorted prefix index over stock symbols and the words of their names.
+
+    Lookups bisect to the range of keys with the query prefix and walk it
+    until ``limit`` stocks are found. Multi-word queries walk the range of
+    their most selective word and filter on the others, so a search costs
+    O(log n) per word plus a walk bounded by the smallest of those ranges.
+    Symbols are matched against the whole upper-cased query, punctuation
+    included. Symbol matches rank before name matches and the exact symbol
+    comes first.
+    """
+
+    def __init__(self, stocks):
+        self.stocks = {stock["id"]: stock for stock in stocks}
+        self.symbols = sorted(
+            (stock["symbol"].upper(), stock["id"]) for stock in stocks
+        )
+        self.words = sorted(
+            (word, stock["id"])
+            for stock in stocks
+            for word in set(split_words(stock["name"]))
+        )
+
+    def search(self, query, limit=10):
+        symbol = query.strip().upper()
+        if not symbol:
+            return []
+
+        found = dict.fromkeys(
+            self.symbols[index][1]
+            for index in self.prefix_range(self.symbols, symbol)[:limit]
+        )
+        words = split_words(query)
+        if not words:
+            return [self.stocks[stock_id] for stock_id in found]
+        ranges = [self.prefix_range(self.words, word) for word in words]
+        seed = min(range(len(words)), key=lambda i: len(ranges[i]))
+        others = words[:seed] + words[seed + 1 :]
+        for index in ranges[seed]:
+            if len(found) >= limit:
+                break
+            stock_id = self.words[index][1]
+            if stock_id not in found and self.matches(stock_id, others):
+                found[stock_id] = None
+        return [self.stocks[stock_id] for stock_id in found]
+
+    def matches(self, stock_id, words):
+        # Every other query word has to start one of the words of the name
+        name_words = split_words(self.stocks[stock_id]["name"])
+        return all(
+            any(name_word.startswith(word) for name_word in name_words)
+            for word in words
+        )
+
+    @staticmethod
+    def prefix_range(keys, prefix):
+        # "~" sorts after every character of a symbol or name word
+        return range(bisect_left(keys, (prefix,)), bisect_left(keys, (prefix + "~",)))
+
+
+def get_index():
+    """Return the index of the current process, rebuilt after stocks changed."""
+    global _index, _index_version
+    from stockApp.models import StockData
+
+    version = get_stocks_version()
+    if _index is None or _index_version != version:
+        stocks = StockData.objects.values_list(
+            "id", "symbol", "name", "exchange", "type", "currency__name"
+        )
+        _index = SymbolIndex([dict(zip(search_fields, stock)) for stock in stocks])
+        _index_version = version
+    return _index
@@ -1,7 +1,16 @@
+from django.conf import settings
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
-from stockApp.models import CustomUser, StockData, Country, Currency
+from stockApp.models import (
+    CANDLE_FIELDS,
+    CustomUser,
+    MarketBreadth,
+    MarketMover,
+    StockData,
+    Country,
+    Currency,
+)
 
 
 class CommonUserSerializer(serializers.ModelSerializer):
@@ -36,18 +45,157 @@ class UpdateUserSerializer(serializers.ModelSerializer):
         return instance
 
 
-class StockDataWithPricesSerializer(serializers.Serializer):
-    symbol = serializers.CharField(source="stock__symbol")
-    name = serializers.CharField(source="stock__name")
-    exchange = serializers.CharField(source="stock__exchange")
-    type = serializers.CharField(source="stock__type")
-    currency = serializers.CharField(source="stock__currency__name")
-    country = serializers.CharField(source="stock__country__name")
+def build_row_mapper(fields):
+    """Build a function mapping one ``.values()`` row to its representation.
+
+    Char/float/integer fields are cast directly and any other field falls back
+    to its own ``to_representation``. Converters are looked up once per
+    serializer instead of once per row and field.
+    """
+    casts = {
+        serializers.CharField: str,
+        serializers.FloatField: float,
+        serializers.IntegerField: int,
+    }
+    spec = [
+        (name, field.source or name, casts.get(type(field), field.to_representation))
+        for name, field in fields.items()
+    ]
+
+    def map_row(row):
+        return {
+            name: None if (value := row[source]) is None else convert(value)
+            for name, source, convert in spec
+        }
+
+    return map_row
+
+
+class RowListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        map_row = self.child.get_row_mapper()
+        return [map_row(row) for row in data]
+
+
+class RowSerializer(serializers.Serializer):
+    """Read only serializer over ``.values()`` rows with a prebuilt row mapper."""
+
+    _row_mapper = None
+
+    class Meta:
+        list_serializer_class = RowListSerializer
+
+    @classmethod
+    def get_row_mapper(cls):
+        if cls.__dict__.get("_row_mapper") is None:
+            cls._row_mapper = build_row_mapper(cls._declared_fields)
+        return cls._row_mapper
+
+    def to_representation(self, instance):
+        return self.get_row_mapper()(instance)
+
+
+class StockDataWithPricesSerializer(RowSerializer):
+    symbol = serializers.CharField()
+    name = serializers.CharField()
+    exchange = serializers.CharField()
+    type = serializers.CharField()
+    currency = serializers.CharField()
+    country = serializers.CharField()
     open = serializers.FloatField()
     close = serializers.FloatField()
     high = serializers.FloatField()
     low = serializers.FloatField()
     volume = serializers.FloatField()
+    change_percent = serializers.FloatField()
+    volatility_30 = serializers.FloatField()
+    average_volume_30 = serializers.FloatField()
+    high_52w = serializers.FloatField()
+    low_52w = serializers.FloatField()
+
+
+class StockRangeQuerySerializer(serializers.Serializer):
+    shape = serializers.ChoiceField(["rows", "columns"], default="rows")
+
+    def get_fields(self):
+        # "from" is a keyword, errors are keyed by the query parameter names
+        fields = super().get_fields()
+        fields["from"] = serializers.DateField(source="start", required=False)
+        fields["to"] = serializers.DateField(source="end", required=False)
+        return fields
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"from": "must not be after to"})
+        return attrs
+
+
+class StockColumnsQuerySerializer(StockRangeQuerySerializer):
+    columns = serializers.CharField(default=",".join(CANDLE_FIELDS))
+
+    def validate_columns(self, value):
+        columns = set(value.split(","))
+        if not columns <= set(CANDLE_FIELDS):
+            raise serializers.ValidationError(
+                f"must be a comma separated subset of {', '.join(CANDLE_FIELDS)}"
+            )
+        return [field for field in CANDLE_FIELDS if field in columns]
+
+
+class StockHistoryQuerySerializer(StockColumnsQuerySerializer):
+    interval = serializers.ChoiceField(["day", "week", "month"], default="day")
+
+
+class StockExportQuerySerializer(StockColumnsQuerySerializer):
+    symbols = serializers.CharField()
+
+    def validate_symbols(self, value):
+        # One request never streams the whole table
+        symbols = list(dict.fromkeys(symbol for symbol in value.split(",") if symbol))
+        if not symbols:
+            raise serializers.ValidationError("must list at least one symbol")
+        if len(symbols) > settings.EXPORT_MAX_SYMBOLS:
+            raise serializers.ValidationError(
+                f"must list at most {settings.EXPORT_MAX_SYMBOLS} symbols"
+            )
+        return symbols
+
+
+class MarketMoversQuerySerializer(serializers.Serializer):
+    metric = serializers.ChoiceField(
+        MarketMover.Metric.choices, default=MarketMover.Metric.GAINERS
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.MARKET_MOVERS_SIZE, default=10
+    )
+
+
+class MarketMoverSerializer(RowSerializer):
+    rank = serializers.IntegerField()
+    symbol = serializers.CharField()
+    name = serializers.CharField()
+    close = serializers.FloatField()
+    change_percent = serializers.FloatField()
+    volume = serializers.FloatField()
+
+
+class MarketBreadthSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MarketBreadth
+        fields = ["date", "advancers", "decliners", "unchanged", "refreshed_at"]
+
+
+class FollowSerializer(serializers.Serializer):
+    """Stocks to follow or unfollow by ``id``, a list of ``ids`` or ``symbols``."""
+
+    id = serializers.IntegerField(required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    symbols = serializers.ListField(child=serializers.CharField(), required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("id, ids or symbols is required")
+        return attrs
 
 
 class StockRequestSerializer(serializers.Serializer):
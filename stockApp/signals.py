@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from stockApp.cache import bump_stocks_version
+from stockApp.models import StockData
+
+
+@receiver(post_save, sender=StockData)
+@receiver(post_delete, sender=StockData)
+def stock_data_changed(sender, **kwargs):
+    transaction.on_commit(bump_stocks_version)
@@ -0,0 +1,71 @@
+import math
+from datetime import timedelta
+
+# Volatility and average volume are exponentially weighted with the span of
+# a 30 day window, so a new bar updates them without the one leaving it
+STATS_SPAN = 30
+STATS_ALPHA = 2 / (STATS_SPAN + 1)
+YEAR = timedelta(days=365)
+STATISTICS_FIELDS = [
+    "previous_close",
+    "previous_volatility_30",
+    "previous_average_volume_30",
+    "change_percent",
+    "volatility_30",
+    "average_volume_30",
+    "high_52w",
+    "high_52w_date",
+    "low_52w",
+    "low_52w_date",
+]
+
+
+def step(previous_close, previous_volatility, previous_average_volume, close, volume):
+    """Change %, volatility and average volume after a bar, in O(1).
+
+    Volatility is the weighted standard deviation of the daily change in %.
+    """
+    if not previous_close:
+        return 0.0, previous_volatility, float(volume)
+    change = (close / previous_close - 1) * 100
+    variance = (1 - STATS_ALPHA) * previous_volatility**2 + STATS_ALPHA * change**2
+    average_volume = (1 - STATS_ALPHA) * previous_average_volume + STATS_ALPHA * volume
+    return change, math.sqrt(variance), average_volume
+
+
+def highest(*extremes):
+    # Ties keep the latest date, which leaves the 52-week window last
+    return max(extremes, key=lambda extreme: (extreme[0], extreme[1]))
+
+
+def lowest(*extremes):
+    return min(extremes, key=lambda extreme: (extreme[0], -extreme[1].toordinal()))
+
+
+def from_history(bars):
+    """Statistics of the last of ``(date, high, low, close, volume)`` bars.
+
+    ``bars`` are in date order and cover the 52 weeks up to the last one.
+    """
+    previous_close = None
+    volatility = 0.0
+    average_volume = float(bars[0][4])
+    for date, high, low, close, volume in bars:
+        previous = (previous_close, volatility, average_volume)
+        change, volatility, average_volume = step(*previous, close, volume)
+        previous_close = close
+
+    high_52w, high_52w_date = highest(*((bar[1], bar[0]) for bar in bars))
+    low_52w, low_52w_date = lowest(*((bar[2], bar[0]) for bar in bars))
+    return {
+        "previous_close": previous[0],
+        "previous_volatility_30": previous[1],
+        "previous_average_volume_30": previous[2],
+        "change_percent": change,
+        "volatility_30": volatility,
+        "average_volume_30": average_volume,
+        "high_52w": high_52w,
+        "high_52w_date": high_52w_date,
+        "low_52w": low_52w,
+        "low_52w_date": low_52w_date,
+    }
@@ -0,0 +1,12 @@
+from django.conf import settings
+import redis
+
+_client = None
+
+
+def get_redis():
+    """Shared Redis client for application state kept outside the cache."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.STORE_REDIS_URL)
+    return _client
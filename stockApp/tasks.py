@@ -1,59 +1,402 @@
-import random
-from time import sleep
+import asyncio
+import csv
+import logging
+from datetime import date
 
-from asgiref.sync import async_to_sync
 from celery import shared_task
-from channels.layers import get_channel_layer
+from channels.db import database_sync_to_async
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+import httpx
 import requests
 
-from stockApp.models import StockData, StockTimeSeriesData
+from stockApp.broadcast import broadcast, flush_updates, user_group
+from stockApp.cache import invalidate_following_quotes
+from stockApp.models import (
+    Country,
+    Currency,
+    CustomUser,
+    MarketMover,
+    StockData,
+    StockIndicator,
+    StockListing,
+    StockTimeSeriesData,
+)
+from stockApp.partitions import create_yearly_partitions, detach_yearly_partition
+from stockApp.serializers import StockDataSerializer
+from stockApp.twelvedata import get_async_client, get_client
+
+logger = logging.getLogger(__name__)
+
+STOCK_REQUEST_PARAMS = {
+    "country": "United States",
+    "exchange": "NASDAQ",
+    "type": "Common Stock",
+    "currency": "USD",
+}
+
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_time_series_value(stock, value):
+    """Bar of a TwelveData value, None when its prices cannot be stored."""
+    bar = StockTimeSeriesData(
+        stock=stock,
+        open=value["open"],
+        high=value["high"],
+        low=value["low"],
+        close=value["close"],
+        volume=value["volume"],
+        date=str(value["datetime"]).split(" ")[0],
+    )
+    # One bar out of range would fail the insert of its whole chunk
+    if not bar.fits():
+        logger.warning("Skipping %s bar of %s out of range", stock.symbol, bar.date)
+        return None
+    return bar
+
+
+def latest_time_series_params(stock_symbols):
+    return {"symbol": ",".join(stock_symbols), "interval": "1day", "outputsize": 1}
+
+
+def parse_time_series_payload(stocks, stock_symbols, payload):
+    # Single symbol requests and request level errors are not keyed by symbol
+    if len(stock_symbols) == 1 or payload.get("status") == "error":
+        payload = {symbol: payload for symbol in stock_symbols}
+
+    bars = []
+    for symbol, time_series in payload.items():
+        stock = stocks.get(symbol)
+        if stock is None or not time_series.get("values"):
+            continue
+        bar = parse_time_series_value(stock, time_series["values"][0])
+        if bar is not None:
+            bars.append(bar)
+    return bars
+
+
+async def refresh_time_series(stocks, batches):
+    """Fetch every batch concurrently and write bars as responses arrive."""
+    upsert = database_sync_to_async(StockTimeSeriesData.objects.upsert)
+
+    async def fetch(client, batch):
+        try:
+            payload = await client.get_json(
+                "time_series",
+                params=latest_time_series_params(batch),
+                credits=len(batch),
+            )
+        except httpx.HTTPError:
+            payload = None
+        return batch, payload if isinstance(payload, dict) else {}
+
+    saved = 0
+    bars = []
+    async with get_async_client() as client:
+        for result in asyncio.as_completed([fetch(client, batch) for batch in batches]):
+            batch, payload = await result
+            bars += parse_time_series_payload(stocks, batch, payload)
+            if len(bars) >= settings.TIME_SERIES_CHUNK_SIZE:
+                await upsert(bars)
+                saved += len(bars)
+                bars = []
+
+    if bars:
+        await upsert(bars)
+        saved += len(bars)
+    return saved
+
+
+@shared_task
+def flush_market_updates():
+    return flush_updates()
+
+
+@shared_task
+def get_stocks_time_series(stock_symbols):
+    stocks = StockData.objects.in_bulk(stock_symbols, field_name="symbol")
+
+    payload = get_client().get_json(
+        "time_series",
+        params=latest_time_series_params(stock_symbols),
+        credits=len(stock_symbols),
+    )
+    bars = parse_time_series_payload(stocks, stock_symbols, payload)
+
+    StockTimeSeriesData.objects.upsert(bars)
+    if bars:
+        update_stock_indicators.delay(
+            sorted({bar.stock_id for bar in bars}),
+            since=min(str(bar.date) for bar in bars),
+        )
+
+    return len(bars)
 
 
 @shared_task
 def get_stock_time_series(stock_symbol):
-    base_url = (
-        "https://api.twelvedata.com/time_series?symbol={}&interval=1day&apikey={}"
+    get_stocks_time_series([stock_symbol])
+    return 0
+
+
+@shared_task(bind=True)
+def request_stock(self, user_id, stock_symbol):
+    """Look up a symbol upstream, add it and make the requesting user follow it.
+
+    The outcome is returned as the job result and pushed to the user's sockets.
+    Symbols in the local catalog are added without an upstream lookup.
+    """
+    listing = (
+        StockListing.objects.listed(**STOCK_REQUEST_PARAMS)
+        .filter(symbol=stock_symbol)
+        .first()
     )
-    api_key = getattr(settings, "TWELVEDATA_API_KEY", None)
-    stock = StockData.objects.filter(symbol=stock_symbol).first()
+    if listing is not None:
+        result = create_listed_stock(user_id, listing)
+    else:
+        try:
+            data = get_client().get_json(
+                "stocks", params={**STOCK_REQUEST_PARAMS, "symbol": stock_symbol}
+            )
+        except (requests.RequestException, ValueError):
+            result = {"status": "failed", "message": "Stock lookup failed"}
+        else:
+            result = create_requested_stock(user_id, stock_symbol, data.get("data"))
 
-    response = requests.get(base_url.format(stock.symbol, api_key))
-    timeseries_json = response.json()["values"][0]
-    timeseries_json["datetime"] = str(timeseries_json["datetime"]).split(" ")[0]
-    StockTimeSeriesData.objects.get_or_create(
-        stock=stock,
-        open=timeseries_json["open"],
-        high=timeseries_json["high"],
-        low=timeseries_json["low"],
-        close=timeseries_json["close"],
-        volume=timeseries_json["volume"],
-        date=timeseries_json["datetime"],
-    )
-    stock.last_time_series_update = timeseries_json["datetime"]
-    stock.save()
-
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        "market",
-        {
-            "type": "chat.message",
-            "message": {
-                "symbol": stock_symbol,
-                "price": timeseries_json["close"],
-                "type": "update",
-            },
+    broadcast(
+        {"type": "request", "id": self.request.id, **result},
+        groups=[user_group(user_id)],
+    )
+    return result
+
+
+def create_requested_stock(user_id, stock_symbol, data):
+    if not data:
+        return {
+            "status": "not_found",
+            "message": f"No stock listed with provided symbol - {stock_symbol}",
+        }
+
+    stock_serializer = StockDataSerializer(data=data[0])
+    if not stock_serializer.is_valid():
+        return {"status": "invalid", "errors": stock_serializer.errors}
+
+    stock = stock_serializer.save()
+    return {"status": "created", "stock": follow_requested_stock(user_id, stock)}
+
+
+def create_listed_stock(user_id, listing):
+    try:
+        with transaction.atomic():
+            stock = listing.promote()
+    except IntegrityError:
+        return {"status": "invalid", "errors": {"symbol": ["Stock already exists"]}}
+    return {"status": "created", "stock": follow_requested_stock(user_id, stock)}
+
+
+def follow_requested_stock(user_id, stock):
+    """Make the requesting user follow a newly added stock and announce it."""
+    CustomUser.objects.get(pk=user_id).following.add(stock)
+    invalidate_following_quotes(user_id)
+
+    data = StockDataSerializer(stock).data
+    message = {
+        "symbol": stock.symbol,
+        "price": "---",
+        "type": "add",
+        "currency": data.get("currency"),
+        "name": stock.name,
+    }
+    broadcast(message)
+    # Sockets of the requesting user start following the new symbol
+    broadcast(
+        message,
+        groups=[user_group(user_id)],
+        event_type="stock.subscribe",
+        symbols=[stock.symbol],
+    )
+
+    get_stock_time_series.delay(stock.symbol)
+    return data
+
+
+@shared_task
+def backfill_stock_time_series(
+    stock_symbol, outputsize=5000, start_date=None, end_date=None
+):
+    stock = StockData.objects.get(symbol=stock_symbol)
+
+    # CSV output can be parsed line by line while it is downloaded, so only
+    # one chunk of bars is kept in memory regardless of history length
+    response = get_client().request(
+        "time_series",
+        params={
+            "symbol": stock_symbol,
+            "interval": "1day",
+            "outputsize": outputsize,
+            "start_date": start_date,
+            "end_date": end_date,
+            "format": "CSV",
+            "delimiter": ";",
         },
+        stream=True,
     )
+    # The streamed connection only goes back to the pool once closed
+    try:
+        # Errors such as an unknown symbol or exhausted credits come as JSON
+        if "csv" not in response.headers.get("Content-Type", ""):
+            try:
+                error = response.json()["message"]
+            except (ValueError, TypeError, KeyError):
+                error = f"HTTP {response.status_code}"
+            logger.warning("Backfill of %s failed: %s", stock_symbol, error)
+            return 0
 
-    return 0
+        rows = csv.DictReader(response.iter_lines(decode_unicode=True), delimiter=";")
+        saved = 0
+        for chunk in chunks(rows, settings.TIME_SERIES_CHUNK_SIZE):
+            bars = [parse_time_series_value(stock, row) for row in chunk]
+            bars = [bar for bar in bars if bar is not None]
+            StockTimeSeriesData.objects.upsert(bars)
+            saved += len(bars)
+    finally:
+        response.close()
+
+    # Older bars change every indicator after them
+    if saved:
+        update_stock_indicators.delay([stock.pk], full=True)
+    return saved
+
+
+def time_series_wave_size():
+    """Symbols that one minute of API credits can fetch, in whole batches."""
+    batch_size = settings.TWELVEDATA_BATCH_SIZE
+    return max(1, settings.TWELVEDATA_CREDITS_PER_MINUTE // batch_size) * batch_size
 
 
 @shared_task
-def get_all_stocks_time_series():
-    stocks = list(StockData.objects.all())
+def refresh_stocks_time_series(after=None):
+    """Fetch the wave of symbols following ``after`` concurrently.
+
+    Every symbol costs one API credit and a wave spends at most a minute of
+    credits. The next wave is scheduled once those credits are back, so only
+    one task waits in the broker at a time and never longer than a minute. It
+    is scheduled before fetching, a failing wave does not end the refresh.
+    """
+    wave_size = time_series_wave_size()
+    symbols = StockData.objects.order_by("symbol").values_list("symbol", flat=True)
+    if after is not None:
+        symbols = symbols.filter(symbol__gt=after)
+    symbols = list(symbols[:wave_size])
+    if len(symbols) == wave_size:
+        refresh_stocks_time_series.apply_async(
+            args=[symbols[-1]],
+            countdown=wave_size * 60 / settings.TWELVEDATA_CREDITS_PER_MINUTE,
+        )
 
-    for stock in stocks:
-        get_stock_time_series.delay(stock.symbol)
-        sleep(10)
+    stocks = StockData.objects.in_bulk(symbols, field_name="symbol")
+    batches = chunks(symbols, settings.TWELVEDATA_BATCH_SIZE)
+    saved = asyncio.run(refresh_time_series(stocks, batches))
+    if saved:
+        # Movers follow the quotes once the whole wave has landed
+        MarketMover.objects.refresh()
+        update_stock_indicators.delay([stock.pk for stock in stocks.values()])
+    return saved
+
+
+@shared_task
+def get_all_stocks_time_series():
+    # Waves are chained instead of all scheduled up front: with a few
+    # thousand symbols the last countdowns would be hours away, past the
+    # broker's consumer timeout for unacknowledged tasks
+    refresh_stocks_time_series.delay()
     return 0
+
+
+@shared_task
+def update_stock_indicators(stock_ids, full=False, since=None):
+    if since is not None:
+        since = date.fromisoformat(since)
+    return sum(
+        StockIndicator.objects.refresh(stock_id, full=full, since=since)
+        for stock_id in stock_ids
+    )
+
+
+def get_name_ids(model, names):
+    model.objects.bulk_create(
+        [model(name=name) for name in names], ignore_conflicts=True
+    )
+    return dict(model.objects.filter(name__in=names).values_list("name", "id"))
+
+
+@shared_task
+def refresh_stock_listings():
+    """Replace the local catalog with the current TwelveData ``/stocks`` list."""
+    data = get_client().get_json("stocks").get("data")
+    # Keep the previous catalog when the listing could not be fetched
+    if not data:
+        return 0
+
+    listings = {(row["symbol"], row["exchange"]): row for row in data}
+    countries = get_name_ids(Country, {row["country"] for row in listings.values()})
+    currencies = get_name_ids(Currency, {row["currency"] for row in listings.values()})
+
+    refreshed_at = timezone.now()
+    with transaction.atomic():
+        for chunk in chunks(listings.values(), settings.TIME_SERIES_CHUNK_SIZE):
+            StockListing.objects.bulk_create(
+                [
+                    StockListing(
+                        symbol=row["symbol"],
+                        name=row["name"],
+                        exchange=row["exchange"],
+                        mic_code=row.get("mic_code", ""),
+                        type=row["type"],
+                        currency_id=currencies[row["currency"]],
+                        country_id=countries[row["country"]],
+                        refreshed_at=refreshed_at,
+                    )
+                    for row in chunk
+                ],
+                update_conflicts=True,
+                unique_fields=["symbol", "exchange"],
+                update_fields=[
+                    "name",
+                    "mic_code",
+                    "type",
+                    "currency",
+                    "country",
+                    "refreshed_at",
+                ],
+            )
+        # Delisted instruments were not part of this refresh
+        StockListing.objects.filter(refreshed_at__lt=refreshed_at).delete()
+
+    return len(listings)
+
+
+@shared_task
+def create_time_series_partitions():
+    """Create the bar partitions of the current and the coming years."""
+    year = timezone.now().year
+    return create_yearly_partitions(
+        StockTimeSeriesData,
+        range(year, year + settings.TIME_SERIES_PARTITIONS_AHEAD + 1),
+    )
+
+
+@shared_task
+def detach_time_series_partition(year, drop=False):
+    return detach_yearly_partition(StockTimeSeriesData, year, drop=drop)
@@ -1,15 +1,78 @@
-from datetime import datetime
+import asyncio
+import base64
+import gzip
+import json
+import tempfile
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from decimal import Decimal
+from io import BytesIO, StringIO
+from threading import Event, Thread
+from urllib.parse import parse_qs, urlparse
 from unittest.mock import patch, MagicMock
 
 import factory.django
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Avg, Max, Sum
 from django.test import Client
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
 from rest_framework_simplejwt.tokens import AccessToken
 
+from stockApp import indicators, stats
+from stockApp.broadcast import (
+    FLUSH_SCHEDULED_KEY,
+    MARKET_GROUP,
+    PENDING_UPDATES_KEY,
+    broadcast,
+    buffer_updates,
+    flush_updates,
+    publish_updates,
+    stock_group,
+    user_group,
+)
+from stockApp.consumers import StockConsumer
 from stockApp.models import CustomUser, Country, Currency
-from stockApp.models import StockData, StockTimeSeriesData
-from stockApp.tasks import get_all_stocks_time_series, get_stock_time_series
+from stockApp.models import (
+    LatestQuote,
+    MarketBreadth,
+    MarketMover,
+    StockData,
+    StockIndicator,
+    StockListing,
+    StockTimeSeriesData,
+)
+from stockApp.parsers import ORJSONParser
+from stockApp.partitions import ensure_yearly_partitions, yearly_partitions
+from stockApp.quotes import QUOTES_KEY, SEQUENCE_KEY, get_snapshot
+from stockApp.ratelimit import RedisTokenBucket, TokenBucket
+from stockApp.renderers import ORJSONRenderer
+from stockApp.search import SymbolIndex
+from stockApp.serializers import StockDataWithPricesSerializer
+from stockApp.store import get_redis
+from stockApp.twelvedata import AsyncTwelveDataClient, TwelveDataClient
+from stockApp.tasks import (
+    backfill_stock_time_series,
+    create_time_series_partitions,
+    detach_time_series_partition,
+    get_all_stocks_time_series,
+    get_stock_time_series,
+    get_stocks_time_series,
+    refresh_stock_listings,
+    refresh_stocks_time_series,
+    request_stock,
+)
 from stockProject.celery import app
 
 
@@ -23,6 +86,15 @@ class UserFactory(factory.django.DjangoModelFactory):
     password = factory.django.Password("password")
 
 
+class StockTimeSeriesDataFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = "stockApp.StockTimeSeriesData"
+
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        return model_class.objects.upsert([model_class(*args, **kwargs)])[0]
+
+
 class TestUsersEndpoint(TestCase):
     def setUp(self):
         self.c = Client()
@@ -251,16 +323,15 @@ class TestGetStockTimeSeries(TestCase):
             ]
         }
 
-    @patch("stockApp.tasks.requests.get")
-    @patch("stockApp.tasks.sleep")
-    def test_get_all_stock_time_series_success(self, mock_sleep, mock_get):
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_get_stock_time_series_success(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = self.response_result
         mock_get.return_value = mock_response
 
-        get_all_stocks_time_series()
+        get_stock_time_series(self.stock.symbol)
 
-        stock_time_series = StockTimeSeriesData.objects.get(stock=self.stock)
+        stock_time_series = StockTimeSeriesData.objects.get(stock__symbol="AAPL")
         stock = StockData.objects.get(symbol="AAPL")
 
         self.assertEqual(stock_time_series.open, 100.0)
@@ -272,282 +343,2545 @@ class TestGetStockTimeSeries(TestCase):
             datetime.strptime("2020-01-01", "%Y-%m-%d").date(),
         )
 
-    @patch("stockApp.tasks.requests.get")
-    @patch("stockApp.tasks.sleep")
-    def test_get_stock_time_series_success(self, mock_sleep, mock_get):
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_get_stocks_time_series_batch(self, mock_get):
+        msft, created = StockData.objects.get_or_create(
+            symbol="MSFT", country=self.country, currency=self.currency
+        )
         mock_response = MagicMock()
-        mock_response.json.return_value = self.response_result
+        mock_response.json.return_value = {
+            "AAPL": self.response_result,
+            "MSFT": {"code": 400, "message": "Not found", "status": "error"},
+        }
         mock_get.return_value = mock_response
 
-        get_stock_time_series(self.stock.symbol)
+        result = get_stocks_time_series(["AAPL", "MSFT"])
 
-        stock_time_series = StockTimeSeriesData.objects.get(stock__symbol="AAPL")
-        stock = StockData.objects.get(symbol="AAPL")
+        mock_get.assert_called_once()
+        self.assertEquals(mock_get.call_args.kwargs["params"]["symbol"], "AAPL,MSFT")
+        self.assertEquals(result, 1)
+        self.assertTrue(StockTimeSeriesData.objects.filter(stock=self.stock).exists())
+        self.assertFalse(StockTimeSeriesData.objects.filter(stock=msft).exists())
 
-        self.assertEqual(stock_time_series.open, 100.0)
-        self.assertEqual(
-            stock_time_series.date, datetime.strptime("2020-01-01", "%Y-%m-%d").date()
-        )
-        self.assertEquals(
-            stock.last_time_series_update,
-            datetime.strptime("2020-01-01", "%Y-%m-%d").date(),
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_get_stocks_time_series_out_of_range(self, mock_get):
+        StockData.objects.create(
+            symbol="005930", country=self.country, currency=self.currency
         )
+        values = self.response_result["values"][0]
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "AAPL": self.response_result,
+            "005930": {"values": [{**values, "close": 300000.0}]},
+        }
+        mock_get.return_value = mock_response
 
+        with self.assertLogs("stockApp.tasks", "WARNING"):
+            result = get_stocks_time_series(["AAPL", "005930"])
 
-class TestStockPricesData(TestCase):
+        self.assertEquals(result, 1)
+        self.assertEquals(StockTimeSeriesData.objects.get().stock, self.stock)
+
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_get_stock_time_series_twice(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.json.return_value = self.response_result
+        mock_get.return_value = mock_response
+
+        get_stock_time_series(self.stock.symbol)
+        self.response_result["values"][0]["close"] = 107.0
+        get_stock_time_series(self.stock.symbol)
+
+        stock_time_series = StockTimeSeriesData.objects.get(stock=self.stock)
+        self.assertEqual(stock_time_series.close, 107.0)
+
+
+class TestStockTimeSeriesUpsert(TestCase):
     def setUp(self):
-        self.c = Client()
         self.country, created = Country.objects.get_or_create(name="United States")
         self.currency, created = Currency.objects.get_or_create(name="USD")
         self.stock, created = StockData.objects.get_or_create(
-            symbol="AAPL",
-            country=self.country,
-            currency=self.currency,
-            last_time_series_update="2020-01-02",
+            symbol="AAPL", country=self.country, currency=self.currency
         )
 
-        StockTimeSeriesData.objects.get_or_create(
+    def bar(self, close, date="2020-01-01"):
+        return StockTimeSeriesData(
+            stock=self.stock,
             open=100.0,
-            close=100.0,
-            high=100.0,
-            low=100.0,
+            high=110.0,
+            low=90.0,
+            close=close,
             volume=100000,
-            date="2020-01-01",
-            stock=self.stock,
+            date=date,
         )
-        StockTimeSeriesData.objects.get_or_create(
-            open=120.0,
-            close=120.0,
-            high=120.0,
-            low=120.0,
-            volume=120000,
-            date="2020-01-02",
-            stock=self.stock,
+
+    def test_upsert_updates_existing_bar(self):
+        StockTimeSeriesData.objects.upsert([self.bar(100.0)])
+        StockTimeSeriesData.objects.upsert(
+            [self.bar(101.0), self.bar(102.0, "2020-01-02")]
         )
 
-        self.user = UserFactory.create()
-        self.user_token = AccessToken.for_user(self.user)
+        self.assertEquals(StockTimeSeriesData.objects.count(), 2)
+        self.assertEquals(
+            StockTimeSeriesData.objects.get(date="2020-01-01").close, 101.0
+        )
 
-    def test_stock_prices_endpoint(self):
-        response = self.c.get(
-            "/stock/prices/", headers={"Authorization": f"Bearer {self.user_token}"}
+    def test_upsert_duplicates_in_one_batch(self):
+        StockTimeSeriesData.objects.upsert([self.bar(100.0), self.bar(101.0)])
+
+        self.assertEquals(StockTimeSeriesData.objects.get().close, 101.0)
+
+    def test_scaled_prices(self):
+        StockTimeSeriesData.objects.upsert([self.bar("150.1299"), self.bar(0.0012)])
+        StockTimeSeriesData.objects.upsert([self.bar(150.1299, "2020-01-02")])
+
+        bars = StockTimeSeriesData.objects.filter(close__gte=0.0012, close__lt=150.1299)
+        self.assertEquals(list(bars.values_list("close", "volume")), [(0.0012, 100000)])
+        self.assertEquals(
+            StockTimeSeriesData.objects.filter(close=150.1299).get().date,
+            date(2020, 1, 2),
         )
 
-        self.assertEquals(response.status_code, 200)
-        self.assertEquals(response.data.get("results")[0]["volume"], 120000)
-        self.assertEquals(response.data.get("count"), 1)
+    def test_scaled_aggregates(self):
+        StockTimeSeriesData.objects.upsert(
+            [self.bar(150.1299), self.bar(150.1301, "2020-01-02")]
+        )
 
-    def test_stock_prices_endpoint_without_token(self):
-        response = self.c.get("/stock/prices/")
+        self.assertEquals(
+            StockTimeSeriesData.objects.aggregate(
+                Avg("close"), Sum("close"), Max("close")
+            ),
+            {"close__avg": 150.13, "close__sum": 300.26, "close__max": 150.1301},
+        )
 
-        self.assertEquals(response.status_code, 401)
+    def test_upsert_refreshes_latest_quote(self):
+        StockTimeSeriesData.objects.upsert([self.bar(102.0, "2020-01-02")])
+        StockTimeSeriesData.objects.upsert([self.bar(100.0, "2020-01-01")])
 
+        quote = LatestQuote.objects.get(stock=self.stock)
+        self.stock.refresh_from_db()
+        self.assertEquals(quote.symbol, "AAPL")
+        self.assertEquals(quote.currency, "USD")
+        self.assertEquals(quote.close, 102.0)
+        self.assertEquals(
+            self.stock.last_time_series_update,
+            datetime.strptime("2020-01-02", "%Y-%m-%d").date(),
+        )
 
-class TestFollowUnfollowEndpoint(TestCase):
+
+class TestBackfillStockTimeSeries(TestCase):
     def setUp(self):
-        self.c = Client()
         self.country, created = Country.objects.get_or_create(name="United States")
         self.currency, created = Currency.objects.get_or_create(name="USD")
         self.stock, created = StockData.objects.get_or_create(
-            symbol="AAPL",
-            country=self.country,
-            currency=self.currency,
-            last_time_series_update="2020-01-02",
+            symbol="AAPL", country=self.country, currency=self.currency
         )
 
-    def test_follow_stock(self):
-        self.user = UserFactory.create()
-        self.user_token = AccessToken.for_user(self.user)
+        self.csv_lines = ["datetime;open;high;low;close;volume"] + [
+            f"2020-01-{day:02};100.0;110.0;90.0;{100 + day};100000"
+            for day in range(5, 0, -1)
+        ]
+        app.conf.update(task_always_eager=True)
 
-        response = self.c.post(
-            "/stock/follow",
-            {"id": self.stock.id},
-            headers={"Authorization": f"Bearer {self.user_token}"},
-        )
+    def mock_csv_response(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.headers = {"Content-Type": "text/csv"}
+        mock_response.iter_lines.side_effect = lambda **kwargs: iter(self.csv_lines)
+        mock_get.return_value = mock_response
 
-        self.assertEquals(response.status_code, 200)
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_backfill(self, mock_get):
+        self.mock_csv_response(mock_get)
 
-    def test_follow_again_stock(self):
-        self.user = UserFactory.create()
-        self.user_token = AccessToken.for_user(self.user)
-        self.user.following.add(self.stock)
+        with self.settings(TIME_SERIES_CHUNK_SIZE=2):
+            saved = backfill_stock_time_series("AAPL", start_date="2020-01-01")
 
-        response = self.c.post(
-            "/stock/follow",
-            {"id": self.stock.id},
-            headers={"Authorization": f"Bearer {self.user_token}"},
+        self.stock.refresh_from_db()
+        self.assertEquals(saved, 5)
+        self.assertEquals(
+            StockTimeSeriesData.objects.filter(stock=self.stock).count(), 5
+        )
+        self.assertEquals(
+            self.stock.last_time_series_update,
+            datetime.strptime("2020-01-05", "%Y-%m-%d").date(),
+        )
+        self.assertTrue(mock_get.call_args.kwargs["stream"])
+        mock_get.return_value.close.assert_called_once()
+        self.assertEquals(
+            mock_get.call_args.kwargs["params"]["start_date"], "2020-01-01"
         )
 
-        self.assertEquals(response.status_code, 400)
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_backfill_is_idempotent(self, mock_get):
+        self.mock_csv_response(mock_get)
 
-    def test_follow_wrong_stock(self):
-        self.user = UserFactory.create()
-        self.user_token = AccessToken.for_user(self.user)
+        backfill_stock_time_series("AAPL")
+        backfill_stock_time_series("AAPL")
 
-        response = self.c.post(
-            "/stock/follow",
-            {"id": 0},
-            headers={"Authorization": f"Bearer {self.user_token}"},
+        self.assertEquals(
+            StockTimeSeriesData.objects.filter(stock=self.stock).count(), 5
         )
 
-        self.assertEquals(response.status_code, 404)
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_backfill_error(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.headers = {"Content-Type": "application/json"}
+        mock_response.json.return_value = {
+            "code": 400,
+            "message": "symbol not found",
+            "status": "error",
+        }
+        mock_get.return_value = mock_response
 
-    def test_follow_stock_without_admin(self):
-        self.user = UserFactory.create()
-        self.user_token = AccessToken.for_user(self.user)
+        with self.assertLogs("stockApp.tasks", "WARNING") as logs:
+            self.assertEquals(backfill_stock_time_series("AAPL"), 0)
 
-        response = self.c.post("/stock/follow", {"id": self.stock.id})
+        self.assertIn("symbol not found", logs.output[0])
+        mock_response.close.assert_called_once()
+        self.assertFalse(StockTimeSeriesData.objects.exists())
 
-        self.assertEquals(response.status_code, 401)
 
-    def test_unfollow_stock(self):
-        self.user = UserFactory.create()
-        self.user_token = AccessToken.for_user(self.user)
-        self.user.following.add(self.stock)
+class TestStockDataWithPricesSerializer(TestCase):
+    def setUp(self):
+        self.row = {
+            "symbol": "AAPL",
+            "name": "Apple Inc",
+            "exchange": "NASDAQ",
+            "type": "Common Stock",
+            "currency": "USD",
+            "country": "United States",
+            "open": 100,
+            "high": 110.0,
+            "low": 90.0,
+            "close": None,
+            "volume": 100000,
+            "change_percent": -1,
+            "volatility_30": 1.5,
+            "average_volume_30": 90000,
+            "high_52w": 120.0,
+            "low_52w": 80.0,
+        }
 
-        response = self.c.post(
-            "/stock/unfollow",
-            {"id": self.stock.id},
-            headers={"Authorization": f"Bearer {self.user_token}"},
+    def test_matches_drf_serializer(self):
+        class PlainSerializer(serializers.Serializer):
+            symbol = serializers.CharField()
+            name = serializers.CharField()
+            exchange = serializers.CharField()
+            type = serializers.CharField()
+            currency = serializers.CharField()
+            country = serializers.CharField()
+            open = serializers.FloatField()
+            close = serializers.FloatField()
+            high = serializers.FloatField()
+            low = serializers.FloatField()
+            volume = serializers.FloatField()
+            change_percent = serializers.FloatField()
+            volatility_30 = serializers.FloatField()
+            average_volume_30 = serializers.FloatField()
+            high_52w = serializers.FloatField()
+            low_52w = serializers.FloatField()
+
+        self.assertEquals(
+            StockDataWithPricesSerializer([self.row], many=True).data,
+            PlainSerializer([self.row], many=True).data,
+        )
+        self.assertEquals(
+            StockDataWithPricesSerializer(self.row).data,
+            PlainSerializer(self.row).data,
         )
 
-        self.assertEquals(response.status_code, 200)
+    def test_benchmark_command(self):
+        out = StringIO()
 
-    def test_unfollow_again_stock(self):
-        self.user = UserFactory.create()
-        self.user_token = AccessToken.for_user(self.user)
+        call_command("benchmark_serializer", rows=10, repeat=1, stdout=out)
 
-        response = self.c.post(
-            "/stock/unfollow",
-            {"id": self.stock.id},
-            headers={"Authorization": f"Bearer {self.user_token}"},
-        )
+        self.assertIn("speedup", out.getvalue())
 
-        self.assertEquals(response.status_code, 400)
 
+class TestORJSONRendererParser(TestCase):
+    def test_render(self):
+        data = {"price": Decimal("1.50"), "symbol": "AAPL", "values": [1, 2.5]}
 
-class TestHomepage(TestCase):
-    def setUp(self):
-        self.c = Client()
-        self.country, created = Country.objects.get_or_create(name="United States")
-        self.currency, created = Currency.objects.get_or_create(name="USD")
-        self.stock, created = StockData.objects.get_or_create(
-            symbol="AAPL",
-            country=self.country,
-            currency=self.currency,
-            last_time_series_update="2021-01-01",
-        )
+        rendered = ORJSONRenderer().render(data)
 
-        StockTimeSeriesData.objects.get_or_create(
-            open=100.0,
-            close=100.0,
-            high=100.0,
-            low=100.0,
-            volume=100000,
-            date="2021-01-01",
-            stock=self.stock,
+        self.assertEquals(
+            json.loads(rendered), {"price": 1.5, "symbol": "AAPL", "values": [1, 2.5]}
         )
 
-        self.user = UserFactory.create()
-        self.user_token = AccessToken.for_user(self.user)
-        self.user.following.add(self.stock)
+    def test_render_int_keys(self):
+        data = {"ids": {0: ["A valid integer is required."]}}
 
-    def test_get_homepage(self):
-        response = self.c.get(
-            "/homepage/", headers={"Authorization": f"Bearer {self.user_token}"}
+        rendered = ORJSONRenderer().render(data)
+
+        self.assertEquals(
+            json.loads(rendered), {"ids": {"0": ["A valid integer is required."]}}
         )
 
-        self.assertEquals(response.status_code, 200)
+    def test_parse(self):
         self.assertEquals(
-            response.headers.get("Content-Type"), "text/html; charset=utf-8"
+            ORJSONParser().parse(BytesIO(b'{"id": [1, 2]}')), {"id": [1, 2]}
         )
 
-    def test_get_homepage_without_token(self):
-        response = self.c.get("/homepage/")
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b"{wrong"))
 
-        self.assertEquals(response.status_code, 401)
+    def test_json_request_and_response(self):
+        user = UserFactory.create()
+        response = self.client.patch(
+            f"/users/{user.pk}",
+            b'{"first_name": "Luna"}',
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"},
+        )
 
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.headers["Content-Type"], "application/json")
+        self.assertEquals(json.loads(response.content)["first_name"], "Luna")
 
-class TestStockRequest(TestCase):
+
+@override_settings(BROADCAST_WINDOW=0)
+class TestStockConsumer(TransactionTestCase):
     def setUp(self):
-        self.c = Client()
-        self.user = UserFactory.create()
-        self.user_token = AccessToken.for_user(self.user)
+        get_redis().delete(QUOTES_KEY, SEQUENCE_KEY)
         self.country, created = Country.objects.get_or_create(name="United States")
         self.currency, created = Currency.objects.get_or_create(name="USD")
         self.stock, created = StockData.objects.get_or_create(
-            symbol="NVDA",
-            country=self.country,
-            currency=self.currency,
-            last_time_series_update="2020-01-02",
+            symbol="AAPL", country=self.country, currency=self.currency
         )
-        self.response_result_correct = {
-            "data": [
-                {
-                    "symbol": "GOOG",
-                    "name": "Alphabet Inc",
-                    "currency": "USD",
-                    "exchange": "NASDAQ",
-                    "mic_code": "XNGS",
-                    "country": "United States",
-                    "type": "Common Stock",
-                }
-            ]
-        }
+        self.user = UserFactory.create()
 
-        self.response_result_wrong = {"data": []}
+    async def connect(self, user=None):
+        communicator = WebsocketCommunicator(
+            StockConsumer.as_asgi(), "/ws/stock-prices/"
+        )
+        if user is not None:
+            communicator.scope["user"] = user
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive_subscription(self, communicator):
+        subscribed = await communicator.receive_json_from()
+        snapshot = await communicator.receive_json_from()
+        self.assertEquals(snapshot["type"], "snapshot")
+        return subscribed["symbols"], snapshot
+
+    async def publish(self, symbol, message):
+        await sync_to_async(broadcast)(
+            message, groups=[MARKET_GROUP, stock_group(symbol)]
+        )
 
-    @patch("stockApp.views.req.get")
-    @patch("stockApp.tasks.get_stock_time_series.delay")
-    def test_request_endpoint(self, mock_task, mock_request):
-        mock_response = MagicMock()
-        mock_response.json.return_value = self.response_result_correct
-        mock_request.return_value = mock_response
+    async def test_anonymous_receives_market(self):
+        communicator = await self.connect()
+        symbols, snapshot = await self.receive_subscription(communicator)
+        self.assertEquals(symbols, ["*"])
 
-        response = self.c.post(
-            "/stock/request",
-            {"symbol": "GOOG"},
-            headers={"Authorization": f"Bearer {self.user_token}"},
-        )
+        await self.publish("MSFT", {"symbol": "MSFT", "price": 1.5, "type": "update"})
 
-        self.assertEquals(response.status_code, 201)
-        mock_task.assert_called_once()
-        mock_request.assert_called_once()
+        message = await communicator.receive_json_from()
+        self.assertEquals(message, {"symbol": "MSFT", "price": 1.5, "type": "update"})
+        await communicator.disconnect()
 
-    @patch("stockApp.views.req.get")
-    def test_request_endpoint_wrong_symbol(self, mock_request):
-        mock_response = MagicMock()
-        mock_response.json.return_value = self.response_result_wrong
-        mock_request.return_value = mock_response
+    async def test_user_receives_followed_symbols(self):
+        await sync_to_async(self.user.following.add)(self.stock)
+        communicator = await self.connect(self.user)
+        symbols, snapshot = await self.receive_subscription(communicator)
+        self.assertEquals(symbols, ["AAPL"])
 
-        response = self.c.post(
-            "/stock/request",
-            {"symbol": "Wrong"},
-            headers={"Authorization": f"Bearer {self.user_token}"},
-        )
+        await self.publish("MSFT", {"symbol": "MSFT"})
+        await self.publish("AAPL", {"symbol": "AAPL"})
 
-        self.assertEquals(response.status_code, 404)
-        mock_request.assert_called_once()
+        self.assertEquals(await communicator.receive_json_from(), {"symbol": "AAPL"})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
 
-    def test_request_endpoint_without_stock_symbol(self):
-        response = self.c.post(
-            "/stock/request",
-            {},
-            headers={"Authorization": f"Bearer {self.user_token}"},
+    async def test_subscribe_and_unsubscribe(self):
+        await sync_to_async(StockData.objects.create)(
+            symbol="MSFT", country=self.country, currency=self.currency
+        )
+        await sync_to_async(self.user.following.add)(self.stock)
+        communicator = await self.connect(self.user)
+        await self.receive_subscription(communicator)
+
+        await communicator.send_json_to({"action": "subscribe", "symbols": ["MSFT"]})
+        symbols, snapshot = await self.receive_subscription(communicator)
+        self.assertEquals(symbols, ["AAPL", "MSFT"])
+        await communicator.send_json_to({"action": "unsubscribe", "symbols": ["AAPL"]})
+        self.assertEquals(
+            await communicator.receive_json_from(),
+            {"type": "subscribed", "symbols": ["MSFT"]},
         )
 
-        self.assertEquals(response.status_code, 400)
+        await self.publish("AAPL", {"symbol": "AAPL"})
+        await self.publish("MSFT", {"symbol": "MSFT"})
 
-    def test_request_endpoint_with_already_existing_symbol(self):
-        response = self.c.post(
-            "/stock/request",
-            {"symbol": "NVDA"},
-            headers={"Authorization": f"Bearer {self.user_token}"},
-        )
+        self.assertEquals(await communicator.receive_json_from(), {"symbol": "MSFT"})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
 
-        self.assertEquals(response.status_code, 400)
+    async def test_subscribe_to_unknown_symbols(self):
+        communicator = await self.connect(self.user)
+        await self.receive_subscription(communicator)
+        await communicator.send_json_to({"action": "unsubscribe", "symbols": ["*"]})
+        await communicator.receive_json_from()
 
-    def test_request_endpoint_with_token(self):
-        response = self.c.post("/stock/request", {"symbol": "GOOG"})
+        await communicator.send_json_to(
+            {"action": "subscribe", "symbols": ["x" * 120, "a b", "NOPE", "AAPL"]}
+        )
 
-        self.assertEquals(response.status_code, 401)
+        self.assertEquals(
+            await communicator.receive_json_from(),
+            {"type": "error", "message": "Unknown symbols are ignored"},
+        )
+        symbols, snapshot = await self.receive_subscription(communicator)
+        self.assertEquals(symbols, ["AAPL"])
+        await communicator.disconnect()
+
+    async def test_wrong_message(self):
+        communicator = await self.connect()
+        await self.receive_subscription(communicator)
+
+        await communicator.send_to(text_data="wrong")
+
+        self.assertEquals((await communicator.receive_json_from())["type"], "error")
+        await communicator.disconnect()
+
+    async def test_user_subscribed_to_requested_stock(self):
+        communicator = await self.connect(self.user)
+        await self.receive_subscription(communicator)
+        await communicator.send_json_to({"action": "unsubscribe", "symbols": ["*"]})
+        await communicator.receive_json_from()
+
+        await sync_to_async(broadcast)(
+            {"symbol": "MSFT", "type": "add"},
+            groups=[user_group(self.user.pk)],
+            event_type="stock.subscribe",
+            symbols=["MSFT"],
+        )
+
+        symbols, snapshot = await self.receive_subscription(communicator)
+        self.assertEquals(symbols, ["MSFT"])
+        self.assertEquals(
+            await communicator.receive_json_from(), {"symbol": "MSFT", "type": "add"}
+        )
+        await communicator.disconnect()
+
+    async def test_snapshot_and_updates_from_quote_store(self):
+        await sync_to_async(self.user.following.add)(self.stock)
+        await sync_to_async(StockTimeSeriesDataFactory.create)(
+            open=1.0,
+            close=1.0,
+            high=1.0,
+            low=1.0,
+            volume=10,
+            date="2020-01-01",
+            stock=self.stock,
+        )
+        communicator = await self.connect(self.user)
+
+        symbols, snapshot = await self.receive_subscription(communicator)
+        self.assertEquals(
+            snapshot["quotes"],
+            [
+                {
+                    "symbol": "AAPL",
+                    "price": 1.0,
+                    "volume": 10.0,
+                    "date": "2020-01-01",
+                    "seq": snapshot["seq"],
+                }
+            ],
+        )
+
+        await sync_to_async(StockTimeSeriesDataFactory.create)(
+            open=2.0,
+            close=2.0,
+            high=2.0,
+            low=2.0,
+            volume=20,
+            date="2020-01-02",
+            stock=self.stock,
+        )
+        message = await communicator.receive_json_from()
+        self.assertEquals(message["type"], "updates")
+        self.assertEquals(message["updates"][0]["price"], 2.0)
+        self.assertGreater(message["updates"][0]["seq"], snapshot["seq"])
+        await communicator.disconnect()
+
+    def test_snapshot_warms_from_latest_quotes(self):
+        StockTimeSeriesDataFactory.create(
+            open=1.0,
+            close=1.0,
+            high=1.0,
+            low=1.0,
+            volume=10,
+            date="2020-01-01",
+            stock=self.stock,
+        )
+        get_redis().delete(QUOTES_KEY, SEQUENCE_KEY)
+
+        snapshot = get_snapshot(["AAPL", "MSFT"])
+
+        self.assertEquals([quote["symbol"] for quote in snapshot["quotes"]], ["AAPL"])
+
+
+class TestMarketBroadcaster(TestCase):
+    def setUp(self):
+        get_redis().delete(PENDING_UPDATES_KEY, FLUSH_SCHEDULED_KEY)
+
+    @patch("stockApp.broadcast.broadcast_many")
+    def test_flush_keeps_latest_update(self, mock_broadcast_many):
+        self.assertTrue(
+            buffer_updates({"AAPL": {"price": 1.0}, "MSFT": {"price": 3.0}}, 1)
+        )
+        self.assertFalse(buffer_updates({"AAPL": {"price": 2.0}}, 1))
+
+        self.assertEquals(flush_updates(), 2)
+
+        messages = mock_broadcast_many.call_args.args[0]
+        self.assertEquals(len(messages), 3)
+        self.assertEquals(messages[0][0], ("market",))
+        self.assertCountEqual(
+            messages[0][1]["updates"], [{"price": 2.0}, {"price": 3.0}]
+        )
+        self.assertIn(
+            (("stock.AAPL",), {"type": "updates", "updates": [{"price": 2.0}]}),
+            messages,
+        )
+        self.assertEquals(flush_updates(), 0)
+
+    @patch("stockApp.tasks.flush_market_updates.apply_async")
+    def test_publish_schedules_one_flush_per_window(self, mock_apply_async):
+        with self.settings(BROADCAST_WINDOW=2):
+            publish_updates({"AAPL": {"price": 1.0}})
+            publish_updates({"AAPL": {"price": 2.0}})
+
+        mock_apply_async.assert_called_once_with(countdown=2)
+
+
+class StubTwelveDataHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if callable(self.server.responses):
+            status, headers, body = self.server.responses(self.path)
+        else:
+            status, headers, body = self.server.responses.pop(0)
+        if status is None:
+            # Simulate a dropped connection
+            self.close_connection = True
+            return
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTwelveDataClient(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubTwelveDataHandler)
+        self.server.requests = []
+        self.server.responses = []
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        get_redis().delete("ratelimit:test")
+        self.client = TwelveDataClient(
+            base_url=f"http://127.0.0.1:{self.server.server_port}",
+            api_key="key",
+            credits_per_minute=600,
+            timeout=1,
+            retries=2,
+            backoff=0,
+            rate_limit_key="ratelimit:test",
+        )
+
+    def json_response(self, payload, status=200):
+        return (
+            status,
+            {"Content-Type": "application/json"},
+            json.dumps(payload).encode(),
+        )
+
+    def test_get_json(self):
+        self.server.responses.append(self.json_response({"data": []}))
+
+        self.assertEquals(
+            self.client.get_json("stocks", {"symbol": "AAPL"}), {"data": []}
+        )
+        self.assertEquals(self.server.requests, ["/stocks?symbol=AAPL&apikey=key"])
+
+    def test_retry_server_errors(self):
+        self.server.responses += [
+            (None, {}, b""),
+            (503, {}, b""),
+            self.json_response({"data": []}),
+        ]
+
+        self.assertEquals(self.client.get_json("stocks"), {"data": []})
+        self.assertEquals(len(self.server.requests), 3)
+
+    def test_retry_rate_limit_in_body(self):
+        self.server.responses += [
+            self.json_response({"code": 429, "status": "error"}),
+            self.json_response({"data": []}),
+        ]
+
+        self.assertEquals(self.client.get_json("stocks"), {"data": []})
+
+    def test_retries_exhausted(self):
+        self.server.responses += [(429, {"Retry-After": "0"}, b"")] * 3
+
+        response = self.client.request("stocks")
+
+        self.assertEquals(response.status_code, 429)
+        self.assertEquals(len(self.server.requests), 3)
+
+    def test_gzip_response(self):
+        body = gzip.compress(json.dumps({"data": [1]}).encode())
+        self.server.responses.append(
+            (
+                200,
+                {"Content-Type": "application/json", "Content-Encoding": "gzip"},
+                body,
+            )
+        )
+
+        self.assertEquals(self.client.get_json("stocks"), {"data": [1]})
+
+    def test_connection_reused(self):
+        self.server.responses += [self.json_response({})] * 2
+        self.client.get_json("stocks")
+
+        with patch(
+            "urllib3.connectionpool.HTTPConnectionPool._new_conn"
+        ) as mock_new_conn:
+            self.client.get_json("stocks")
+
+        mock_new_conn.assert_not_called()
+
+    @patch("stockApp.twelvedata.time.sleep")
+    def test_rate_limit(self, mock_sleep):
+        self.client.rate_limiter = RedisTokenBucket(
+            "ratelimit:test", rate=1, capacity=2
+        )
+        self.server.responses += [self.json_response({})] * 2
+
+        self.client.get_json("time_series", credits=2)
+        mock_sleep.assert_not_called()
+        self.client.get_json("time_series", credits=2)
+
+        self.assertAlmostEqual(mock_sleep.call_args.args[0], 2, delta=0.1)
+
+
+class TestTokenBucket(TestCase):
+    def test_reserve_within_capacity(self):
+        bucket = TokenBucket(rate=1, capacity=5)
+
+        self.assertEquals(bucket.reserve(5), 0)
+
+    def test_reserve_over_capacity(self):
+        bucket = TokenBucket(rate=2, capacity=4)
+        bucket.reserve(4)
+
+        self.assertAlmostEqual(bucket.reserve(4), 2, delta=0.1)
+        self.assertAlmostEqual(bucket.reserve(2), 3, delta=0.1)
+
+
+class TestAsyncTwelveDataClient(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubTwelveDataHandler)
+        self.server.requests = []
+        self.server.responses = []
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        get_redis().delete("ratelimit:test")
+        self.client = AsyncTwelveDataClient(
+            base_url=f"http://127.0.0.1:{self.server.server_port}",
+            api_key="key",
+            credits_per_minute=600,
+            timeout=(1, 1),
+            retries=2,
+            backoff=0,
+            concurrency=2,
+            rate_limit_key="ratelimit:test",
+        )
+
+    async def get_json(self, *args, **kwargs):
+        async with self.client as client:
+            return await client.get_json(*args, **kwargs)
+
+    def test_get_json(self):
+        self.server.responses.append(
+            (200, {"Content-Type": "application/json"}, b'{"data": []}')
+        )
+
+        payload = asyncio.run(self.get_json("stocks", {"symbol": "AAPL"}))
+
+        self.assertEquals(payload, {"data": []})
+        self.assertEquals(self.server.requests, ["/stocks?symbol=AAPL&apikey=key"])
+
+    def test_retry_server_errors(self):
+        self.server.responses += [
+            (None, {}, b""),
+            (200, {"Content-Type": "application/json"}, b'{"code": 429}'),
+            (200, {"Content-Type": "application/json"}, b'{"data": []}'),
+        ]
+
+        self.assertEquals(asyncio.run(self.get_json("stocks")), {"data": []})
+        self.assertEquals(len(self.server.requests), 3)
+
+
+@override_settings(BROADCAST_WINDOW=0)
+class TestGetAllStocksTimeSeries(TransactionTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubTwelveDataHandler)
+        self.server.requests = []
+        self.server.responses = self.time_series_response
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        get_redis().delete("ratelimit:twelvedata")
+        self.addCleanup(get_redis().delete, "ratelimit:twelvedata")
+        app.conf.update(task_always_eager=True)
+        settings = self.settings(
+            TWELVEDATA_BASE_URL=f"http://127.0.0.1:{self.server.server_port}",
+            TWELVEDATA_BATCH_SIZE=4,
+            TWELVEDATA_CREDITS_PER_MINUTE=600,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        for i in range(10):
+            StockData.objects.create(
+                symbol=f"S{i:02}", country=country, currency=currency
+            )
+
+    @staticmethod
+    def time_series_response(path):
+        symbols = parse_qs(urlparse(path).query)["symbol"][0].split(",")
+        payload = {
+            symbol: {
+                "values": [
+                    {
+                        "open": 100.0,
+                        "high": 110.0,
+                        "low": 90.0,
+                        "close": 100.0 + i,
+                        "volume": 1000,
+                        "datetime": "2020-01-01",
+                    }
+                ]
+            }
+            for i, symbol in enumerate(symbols)
+            # S09 is unknown to the API
+            if symbol != "S09"
+        }
+        if len(symbols) == 1:
+            payload = payload.get(symbols[0], {"code": 400, "status": "error"})
+        return 200, {"Content-Type": "application/json"}, json.dumps(payload).encode()
+
+    def test_get_all_stocks_time_series(self):
+        get_all_stocks_time_series()
+
+        self.assertEquals(len(self.server.requests), 3)
+        self.assertEquals(StockTimeSeriesData.objects.count(), 9)
+        self.assertEquals(LatestQuote.objects.count(), 9)
+        self.assertEquals(
+            StockData.objects.get(symbol="S01").last_time_series_update,
+            datetime.strptime("2020-01-01", "%Y-%m-%d").date(),
+        )
+        self.assertIsNone(StockData.objects.get(symbol="S09").last_time_series_update)
+
+    def test_get_all_stocks_time_series_failed_batch(self):
+        responses = self.server.responses
+        self.server.responses = lambda path: (
+            (500, {}, b"") if "S00" in path else responses(path)
+        )
+
+        with self.settings(TWELVEDATA_RETRIES=0):
+            get_all_stocks_time_series()
+
+        self.assertEquals(StockTimeSeriesData.objects.count(), 5)
+        self.assertFalse(StockTimeSeriesData.objects.filter(stock__symbol="S00"))
+
+    @patch("stockApp.tasks.refresh_stocks_time_series.apply_async")
+    def test_refresh_waves_schedule_the_next_one(self, mock_apply_async):
+        with self.settings(TWELVEDATA_CREDITS_PER_MINUTE=8):
+            refresh_stocks_time_series()
+
+            mock_apply_async.assert_called_once_with(args=["S07"], countdown=60)
+            self.assertEquals(StockTimeSeriesData.objects.count(), 8)
+
+            # The next wave runs once the credits are back
+            get_redis().delete("ratelimit:twelvedata")
+            mock_apply_async.reset_mock()
+            refresh_stocks_time_series("S07")
+
+        mock_apply_async.assert_not_called()
+        self.assertEquals(StockTimeSeriesData.objects.count(), 9)
+
+    def test_get_all_stocks_time_series_refreshes_movers(self):
+        get_all_stocks_time_series()
+
+        movers = MarketMover.objects.filter(metric="volume").order_by("rank")
+        self.assertEquals(len(movers), 9)
+        self.assertEquals(MarketBreadth.objects.get().unchanged, 9)
+
+
+class TestStockListing(TestCase):
+    def setUp(self):
+        self.listing = {
+            "symbol": "AAPL",
+            "name": "Apple Inc",
+            "currency": "USD",
+            "exchange": "NASDAQ",
+            "mic_code": "XNGS",
+            "country": "United States",
+            "type": "Common Stock",
+        }
+
+    def refresh(self, data):
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"data": data}
+        with patch(
+            "stockApp.twelvedata.TwelveDataClient.request", return_value=mock_response
+        ):
+            return refresh_stock_listings()
+
+    def test_refresh(self):
+        result = self.refresh(
+            [
+                self.listing,
+                {**self.listing, "exchange": "XETR", "currency": "EUR"},
+                {**self.listing, "symbol": "MSFT", "name": "Microsoft Corp"},
+            ]
+        )
+
+        self.assertEquals(result, 3)
+        self.assertEquals(StockListing.objects.count(), 3)
+        self.assertEquals(
+            set(Currency.objects.values_list("name", flat=True)), {"USD", "EUR"}
+        )
+        listing = StockListing.objects.get(symbol="AAPL", exchange="XETR")
+        self.assertEquals(listing.currency.name, "EUR")
+
+    def test_refresh_updates_and_removes_delisted(self):
+        self.refresh([self.listing, {**self.listing, "symbol": "MSFT"}])
+        self.refresh([{**self.listing, "name": "Apple"}])
+
+        self.assertEquals(
+            list(StockListing.objects.values_list("symbol", "name")),
+            [("AAPL", "Apple")],
+        )
+
+    def test_refresh_failed(self):
+        self.refresh([self.listing])
+
+        self.assertEquals(self.refresh([]), 0)
+        self.assertEquals(StockListing.objects.count(), 1)
+
+    def test_search(self):
+        self.refresh(
+            [
+                {**self.listing, "symbol": "APP", "name": "AppLovin Corp"},
+                self.listing,
+                {**self.listing, "symbol": "AAPB", "name": "GraniteShares"},
+                {**self.listing, "symbol": "MSFT", "name": "Microsoft Corp"},
+                {**self.listing, "symbol": "PINE", "name": "Pineapple Energy"},
+            ]
+        )
+
+        self.assertEquals(
+            [listing.symbol for listing in StockListing.objects.search("aapl")],
+            ["AAPL"],
+        )
+        self.assertEquals(
+            [listing.symbol for listing in StockListing.objects.search("app")],
+            ["APP", "AAPL", "PINE"],
+        )
+
+    def test_search_endpoint(self):
+        self.refresh(
+            [
+                self.listing,
+                {**self.listing, "symbol": "PINE", "name": "Pineapple Energy"},
+                {**self.listing, "symbol": "MSFT", "name": "Microsoft Corp"},
+            ]
+        )
+        user = UserFactory.create()
+
+        response = self.client.get(
+            "/stock/listings/search",
+            {"q": "apple", "limit": 1},
+            headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"},
+        )
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            response.json()["results"],
+            [
+                {
+                    "symbol": "AAPL",
+                    "name": "Apple Inc",
+                    "exchange": "NASDAQ",
+                    "mic_code": "XNGS",
+                    "type": "Common Stock",
+                    "currency": "USD",
+                    "country": "United States",
+                }
+            ],
+        )
+        self.assertFalse(StockData.objects.exists())
+
+    def test_promote(self):
+        self.refresh([self.listing])
+        listing = StockListing.objects.get()
+
+        with self.assertNumQueries(1):
+            stock = listing.promote()
+
+        stock = StockData.objects.get(pk=stock.pk)
+        self.assertEquals(stock.symbol, "AAPL")
+        self.assertEquals(stock.currency.name, "USD")
+        self.assertEquals(stock.country.name, "United States")
+
+
+class TestStockHistory(TestCase):
+    def setUp(self):
+        self.c = Client()
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        self.stock = StockData.objects.create(
+            symbol="AAPL", country=country, currency=currency
+        )
+        other = StockData.objects.create(
+            symbol="MSFT", country=country, currency=currency
+        )
+        # Fri 2024-01-26 up to Thu 2024-02-01, weekends excluded
+        for day, price in [(26, 10), (29, 12), (30, 9), (31, 14)]:
+            StockTimeSeriesDataFactory.create(
+                stock=self.stock,
+                date=f"2024-01-{day}",
+                open=price,
+                high=price + 1,
+                low=price - 1,
+                close=price + 0.5,
+                volume=100,
+            )
+        StockTimeSeriesDataFactory.create(
+            stock=self.stock,
+            date="2024-02-01",
+            open=15,
+            high=20,
+            low=5,
+            close=16,
+            volume=50,
+        )
+        StockTimeSeriesDataFactory.create(
+            stock=other, date="2024-01-29", open=1, high=1, low=1, close=1, volume=1
+        )
+
+    def get_history(self, symbol="AAPL", **params):
+        return self.c.get(
+            f"/stock/{symbol}/history",
+            params,
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+    def test_daily(self):
+        response = self.get_history(**{"from": "2024-01-30", "to": "2024-01-31"})
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            response.json(),
+            {
+                "symbol": "AAPL",
+                "interval": "day",
+                "bars": [
+                    {
+                        "date": "2024-01-30",
+                        "open": 9.0,
+                        "high": 10.0,
+                        "low": 8.0,
+                        "close": 9.5,
+                        "volume": 100.0,
+                    },
+                    {
+                        "date": "2024-01-31",
+                        "open": 14.0,
+                        "high": 15.0,
+                        "low": 13.0,
+                        "close": 14.5,
+                        "volume": 100.0,
+                    },
+                ],
+            },
+        )
+
+    def test_daily_columns(self):
+        response = self.get_history(columns="volume,close", **{"from": "2024-01-31"})
+
+        self.assertEquals(
+            response.json()["bars"],
+            [
+                {"date": "2024-01-31", "close": 14.5, "volume": 100},
+                {"date": "2024-02-01", "close": 16.0, "volume": 50},
+            ],
+        )
+
+    def test_weekly_columns(self):
+        bars = self.get_history(interval="week", columns="high").json()["bars"]
+
+        self.assertEquals(
+            bars,
+            [
+                {"date": "2024-01-22", "high": 11.0},
+                {"date": "2024-01-29", "high": 20.0},
+            ],
+        )
+
+    def test_invalid_columns(self):
+        self.assertEquals(self.get_history(columns="close,id").status_code, 400)
+
+    def test_weekly(self):
+        bars = self.get_history(interval="week").json()["bars"]
+
+        self.assertEquals(
+            bars,
+            [
+                {
+                    "date": "2024-01-22",
+                    "open": 10.0,
+                    "high": 11.0,
+                    "low": 9.0,
+                    "close": 10.5,
+                    "volume": 100.0,
+                },
+                {
+                    "date": "2024-01-29",
+                    "open": 12.0,
+                    "high": 20.0,
+                    "low": 5.0,
+                    "close": 16.0,
+                    "volume": 350.0,
+                },
+            ],
+        )
+
+    def test_monthly_columns(self):
+        response = self.get_history(interval="month", shape="columns")
+
+        self.assertEquals(
+            response.json()["bars"],
+            {
+                "date": ["2024-01-01", "2024-02-01"],
+                "open": [10.0, 15.0],
+                "high": [15.0, 20.0],
+                "low": [8.0, 5.0],
+                "close": [14.5, 16.0],
+                "volume": [400.0, 50.0],
+            },
+        )
+
+    def test_empty_columns(self):
+        response = self.get_history(shape="columns", **{"from": "2025-01-01"})
+
+        self.assertEquals(
+            response.json()["bars"],
+            {
+                "date": [],
+                "open": [],
+                "high": [],
+                "low": [],
+                "close": [],
+                "volume": [],
+            },
+        )
+
+    def test_invalid_params(self):
+        self.assertEquals(self.get_history(interval="year").status_code, 400)
+        self.assertEquals(self.get_history(**{"from": "soon"}).status_code, 400)
+        self.assertEquals(
+            self.get_history(**{"from": "2024-02-01", "to": "2024-01-01"}).status_code,
+            400,
+        )
+
+    def test_invalid_params_keyed_by_query_parameter(self):
+        response = self.get_history(**{"to": "later"})
+        self.assertEquals(list(response.json()), ["to"])
+
+        response = self.get_history(**{"from": "2024-02-01", "to": "2024-01-01"})
+        self.assertEquals(response.json(), {"from": ["must not be after to"]})
+
+    def test_unknown_symbol(self):
+        self.assertEquals(self.get_history("NOPE").status_code, 404)
+
+
+class TestStockHistoryExport(TestCase):
+    def setUp(self):
+        self.c = Client()
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        for symbol in ["AAPL", "MSFT"]:
+            stock = StockData.objects.create(
+                symbol=symbol, country=country, currency=currency
+            )
+            for day in range(1, 6):
+                StockTimeSeriesDataFactory.create(
+                    stock=stock,
+                    date=date(2024, 1, day),
+                    open=10,
+                    high=11,
+                    low=9,
+                    close=10 + day / 4,
+                    volume=100 * day,
+                )
+
+    def export(self, accept=None, **params):
+        headers = {"Authorization": f"Bearer {self.user_token}"}
+        if accept:
+            headers["Accept"] = accept
+        return self.c.get("/stock/history/export", params, headers=headers)
+
+    def test_arrow_export(self):
+        with self.settings(EXPORT_BATCH_SIZE=3):
+            response = self.export(format="arrow", symbols="MSFT")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            response["Content-Type"], "application/vnd.apache.arrow.stream"
+        )
+        reader = pa.ipc.open_stream(b"".join(response.streaming_content))
+        batches = list(reader)
+        self.assertEquals([batch.num_rows for batch in batches], [3, 2])
+        table = pa.Table.from_batches(batches)
+        self.assertEquals(table.column("symbol").to_pylist(), ["MSFT"] * 5)
+        self.assertEquals(table.column("close").to_pylist()[0], 10.25)
+        self.assertEquals(table.column("volume").to_pylist()[-1], 500)
+
+    def test_parquet_export(self):
+        response = self.export(
+            accept="application/vnd.apache.parquet",
+            symbols="AAPL,MSFT",
+            **{"from": "2024-01-02", "to": "2024-01-03"},
+        )
+
+        self.assertEquals(response.status_code, 200)
+        table = pq.read_table(BytesIO(b"".join(response.streaming_content)))
+        self.assertEquals(
+            table.select(["symbol", "date"]).to_pylist(),
+            [
+                {"symbol": symbol, "date": date(2024, 1, day)}
+                for symbol in ["AAPL", "MSFT"]
+                for day in [2, 3]
+            ],
+        )
+
+    def test_export_columns(self):
+        response = self.export(format="arrow", symbols="AAPL", columns="volume,close")
+
+        table = pa.ipc.open_stream(b"".join(response.streaming_content)).read_all()
+        self.assertEquals(table.column_names, ["symbol", "date", "close", "volume"])
+        self.assertEquals(table.column("close").to_pylist()[-1], 11.25)
+
+        response = self.export(format="arrow", symbols="AAPL", columns="open,bid")
+        self.assertEquals(list(response.json()), ["columns"])
+
+    def test_invalid_query(self):
+        response = self.export(
+            format="parquet",
+            symbols="AAPL",
+            **{"from": "2024-01-03", "to": "2024-01-02"},
+        )
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response["Content-Type"], "application/json")
+
+    def test_symbols_required_and_capped(self):
+        response = self.export(format="arrow")
+        self.assertEquals(list(response.json()), ["symbols"])
+
+        with self.settings(EXPORT_MAX_SYMBOLS=1):
+            response = self.export(format="arrow", symbols="AAPL,MSFT")
+        self.assertEquals(response.json(), {"symbols": ["must list at most 1 symbols"]})
+
+    def test_export_without_token(self):
+        self.assertEquals(self.c.get("/stock/history/export").status_code, 401)
+
+    def test_export_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".parquet") as output:
+            call_command(
+                "export_history",
+                output.name,
+                "--symbols",
+                "AAPL",
+                "--from",
+                "2024-01-04",
+                "--columns",
+                "volume",
+                stdout=StringIO(),
+            )
+            table = pq.read_table(output.name)
+
+        self.assertEquals(table.num_rows, 2)
+        self.assertEquals(table.column_names, ["symbol", "date", "volume"])
+        self.assertEquals(table.column("symbol").to_pylist(), ["AAPL", "AAPL"])
+
+
+class TestIndicators(TestCase):
+    def setUp(self):
+        random = np.random.default_rng(7)
+        self.close = 100 + np.cumsum(random.normal(0, 1, 300))
+        self.high = self.close + random.uniform(0, 2, 300)
+        self.low = self.close - random.uniform(0, 2, 300)
+        self.volume = random.uniform(1000, 5000, 300)
+
+    def compute(self, **kwargs):
+        return indicators.compute(
+            self.close, self.high, self.low, self.volume, **kwargs
+        )
+
+    def test_moving_averages(self):
+        columns = self.compute()
+
+        self.assertTrue(np.isnan(columns["sma_20"][18]))
+        self.assertAlmostEqual(columns["sma_20"][19], self.close[:20].mean())
+        self.assertAlmostEqual(columns["sma_50"][-1], self.close[-50:].mean())
+        std = self.close[-20:].std()
+        self.assertAlmostEqual(
+            columns["bollinger_upper"][-1], self.close[-20:].mean() + 2 * std
+        )
+        typical = (self.high + self.low + self.close)[-20:] / 3
+        self.assertAlmostEqual(
+            columns["vwap_20"][-1],
+            (typical * self.volume[-20:]).sum() / self.volume[-20:].sum(),
+        )
+
+    def test_ema(self):
+        columns = self.compute()
+
+        alpha = 2 / 13
+        expected = self.close[0]
+        for price in self.close[1:]:
+            expected = alpha * price + (1 - alpha) * expected
+        self.assertAlmostEqual(columns["ema_12"][-1], expected)
+
+    def test_rsi(self):
+        columns = self.compute()
+
+        changes = np.diff(self.close)
+        gain = np.clip(changes[:14], 0, None).mean()
+        loss = np.clip(-changes[:14], 0, None).mean()
+        self.assertTrue(np.isnan(columns["rsi_14"][13]))
+        self.assertAlmostEqual(columns["rsi_14"][14], 100 - 100 / (1 + gain / loss))
+        for change in changes[14:]:
+            gain = (gain * 13 + max(change, 0)) / 14
+            loss = (loss * 13 + max(-change, 0)) / 14
+        self.assertAlmostEqual(columns["rsi_14"][-1], 100 - 100 / (1 + gain / loss))
+
+    def test_incremental(self):
+        full = self.compute()
+        offset = 250
+        start = offset - indicators.LOOKBACK
+        state = {
+            field: full[field][offset - 1] for field in StockIndicator.state_fields
+        }
+
+        columns = indicators.compute(
+            self.close[start:],
+            self.high[start:],
+            self.low[start:],
+            self.volume[start:],
+            offset=indicators.LOOKBACK,
+            state=state,
+        )
+
+        for name, values in columns.items():
+            np.testing.assert_allclose(values, full[name][offset:], err_msg=name)
+
+
+class TestStockIndicators(TestCase):
+    def setUp(self):
+        self.c = Client()
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        self.stock = StockData.objects.create(
+            symbol="AAPL", country=country, currency=currency
+        )
+        self.add_bars(range(80))
+
+    def add_bars(self, days):
+        StockTimeSeriesData.objects.upsert(
+            [
+                StockTimeSeriesData(
+                    stock=self.stock,
+                    date=date(2024, 1, 1) + timedelta(days=day),
+                    open=100 + day % 7,
+                    high=102 + day % 7,
+                    low=98 + day % 5,
+                    close=100 + day % 7 - day % 3,
+                    volume=1000 + day,
+                )
+                for day in days
+            ]
+        )
+
+    def indicator_rows(self):
+        return list(
+            StockIndicator.objects.filter(stock=self.stock)
+            .order_by("date")
+            .values_list("date", *StockIndicator.indicator_fields())
+        )
+
+    def test_refresh(self):
+        self.assertEquals(StockIndicator.objects.refresh(self.stock.pk), 80)
+
+        first, last = StockIndicator.objects.order_by("date")[::79]
+        self.assertIsNone(first.sma_20)
+        self.assertIsNotNone(last.sma_50)
+        self.assertIsNotNone(last.rsi_14)
+
+    def test_refresh_incremental(self):
+        StockIndicator.objects.refresh(self.stock.pk)
+        self.add_bars(range(80, 83))
+
+        with self.assertNumQueries(5):
+            self.assertEquals(StockIndicator.objects.refresh(self.stock.pk), 4)
+        self.assertEquals(StockIndicator.objects.refresh(self.stock.pk), 1)
+
+        incremental = self.indicator_rows()
+        StockIndicator.objects.refresh(self.stock.pk, full=True)
+        for row, expected in zip(incremental, self.indicator_rows()):
+            self.assertEquals(row[0], expected[0])
+            for value, expected_value in zip(row[1:], expected[1:]):
+                self.assertAlmostEqual(value, expected_value)
+
+    def assert_matches_full_refresh(self):
+        incremental = self.indicator_rows()
+        StockIndicator.objects.refresh(self.stock.pk, full=True)
+        for row, expected in zip(incremental, self.indicator_rows()):
+            for value, expected_value in zip(row[1:], expected[1:]):
+                self.assertAlmostEqual(value, expected_value)
+
+    def test_refresh_revised_latest_bar(self):
+        StockIndicator.objects.refresh(self.stock.pk)
+        StockTimeSeriesData.objects.filter(
+            stock=self.stock, date=date(2024, 3, 20)
+        ).update(close=150)
+
+        self.assertEquals(StockIndicator.objects.refresh(self.stock.pk), 1)
+        self.assert_matches_full_refresh()
+
+    def test_refresh_since(self):
+        StockIndicator.objects.refresh(self.stock.pk)
+        StockTimeSeriesData.objects.filter(
+            stock=self.stock, date=date(2024, 3, 11)
+        ).update(close=150)
+
+        refreshed = StockIndicator.objects.refresh(
+            self.stock.pk, since=date(2024, 3, 11)
+        )
+
+        self.assertEquals(refreshed, 10)
+        self.assert_matches_full_refresh()
+
+    def test_refreshed_on_ingest(self):
+        app.conf.update(task_always_eager=True)
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "values": [
+                {
+                    "open": 100.0,
+                    "high": 110.0,
+                    "low": 90.0,
+                    "close": 105.0,
+                    "volume": 100000,
+                    "datetime": "2024-03-21",
+                }
+            ]
+        }
+        StockIndicator.objects.refresh(self.stock.pk)
+
+        with patch(
+            "stockApp.twelvedata.TwelveDataClient.request", return_value=mock_response
+        ):
+            get_stock_time_series("AAPL")
+
+        self.assertEquals(
+            StockIndicator.objects.order_by("date").last().date, date(2024, 3, 21)
+        )
+
+    def test_indicators_endpoint(self):
+        StockIndicator.objects.refresh(self.stock.pk)
+
+        response = self.c.get(
+            "/stock/AAPL/indicators",
+            {"from": "2024-03-19", "shape": "columns"},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 200)
+        data = response.json()["indicators"]
+        self.assertEquals(data["date"], ["2024-03-19", "2024-03-20"])
+        self.assertEquals(len(data["rsi_14"]), 2)
+        self.assertNotIn("rsi_avg_gain", data)
+
+
+class TestSymbolIndex(TestCase):
+    def setUp(self):
+        self.index = SymbolIndex(
+            [
+                {"id": 1, "symbol": "AAPL", "name": "Apple Inc"},
+                {"id": 2, "symbol": "APP", "name": "AppLovin Corp"},
+                {"id": 3, "symbol": "PINE", "name": "Pineapple Energy"},
+                {"id": 4, "symbol": "AMAT", "name": "Applied Materials Inc"},
+                {"id": 5, "symbol": "AA", "name": "Alcoa Corp"},
+                {"id": 6, "symbol": "BRK.B", "name": "Berkshire Hathaway Inc"},
+            ]
+        )
+
+    def search(self, query, limit=10):
+        return [stock["symbol"] for stock in self.index.search(query, limit)]
+
+    def test_symbol_prefix(self):
+        self.assertEquals(self.search("aa"), ["AA", "AAPL"])
+
+    def test_dotted_symbol(self):
+        self.assertEquals(self.search("brk.b"), ["BRK.B"])
+        self.assertEquals(self.search("brk."), ["BRK.B"])
+        self.assertEquals(self.search("berkshire"), ["BRK.B"])
+
+    def test_symbols_before_names(self):
+        self.assertEquals(self.search("app"), ["APP", "AAPL", "AMAT"])
+
+    def test_multiple_words(self):
+        self.assertEquals(self.search("applied mat"), ["AMAT"])
+        self.assertEquals(self.search("corp"), ["APP", "AA"])
+
+    def test_multiple_words_walk_most_selective_word(self):
+        with patch.object(self.index, "matches", wraps=self.index.matches) as matches:
+            self.assertEquals(self.search("a materials"), ["AMAT"])
+
+        # Only the one name word starting with "MATERIALS" is checked
+        self.assertEquals(matches.call_count, 1)
+        self.assertEquals(matches.call_args.args, (4, ["A"]))
+
+    def test_limit(self):
+        self.assertEquals(self.search("a", limit=2), ["AA", "AAPL"])
+        self.assertEquals(self.search("app", limit=2), ["APP", "AAPL"])
+
+    def test_empty_query(self):
+        self.assertEquals(self.search(" "), [])
+
+
+class TestStockSearch(TestCase):
+    def setUp(self):
+        self.c = Client()
+        cache.clear()
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock = StockData.objects.create(
+                symbol="AAPL",
+                name="Apple Inc",
+                exchange="NASDAQ",
+                type="Common Stock",
+                country=country,
+                currency=currency,
+            )
+
+    def search(self, query):
+        return self.c.get(
+            "/stock/search",
+            {"q": query},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+    def test_search(self):
+        response = self.search("apple")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            response.json()["results"],
+            [
+                {
+                    "id": self.stock.pk,
+                    "symbol": "AAPL",
+                    "name": "Apple Inc",
+                    "exchange": "NASDAQ",
+                    "type": "Common Stock",
+                    "currency": "USD",
+                }
+            ],
+        )
+
+    def test_index_rebuilt_after_change(self):
+        self.search("apple")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.name = "Pear Inc"
+            self.stock.save()
+
+        self.assertEquals(self.search("apple").json()["results"], [])
+        self.assertEquals(len(self.search("pear").json()["results"]), 1)
+
+    def test_search_without_token(self):
+        response = self.c.get("/stock/search", {"q": "apple"})
+
+        self.assertEquals(response.status_code, 401)
+
+
+class TestLatestQuoteStatistics(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        self.stock = StockData.objects.create(
+            symbol="AAPL", country=country, currency=currency
+        )
+        self.bars = [
+            (
+                date(2024, 1, 1) + timedelta(days=day),
+                110.0 + day % 11,
+                90.0 - day % 7,
+                100.0 + day % 5 - day % 3,
+                1000.0 + day,
+            )
+            for day in range(40)
+        ]
+
+    def add_bars(self, bars):
+        StockTimeSeriesData.objects.upsert(
+            [
+                StockTimeSeriesData(
+                    stock=self.stock,
+                    date=day,
+                    open=close,
+                    high=high,
+                    low=low,
+                    close=close,
+                    volume=volume,
+                )
+                for day, high, low, close, volume in bars
+            ]
+        )
+
+    def assertStatistics(self, bars):
+        quote = LatestQuote.objects.get(stock=self.stock)
+        for field, value in stats.from_history(bars).items():
+            if isinstance(value, float):
+                self.assertAlmostEqual(getattr(quote, field), value, msg=field)
+            else:
+                self.assertEquals(getattr(quote, field), value, msg=field)
+
+    def test_rolled_daily(self):
+        self.add_bars(self.bars[:1])
+
+        with patch("stockApp.stats.from_history") as mock_from_history:
+            for bar in self.bars[1:]:
+                self.add_bars([bar])
+
+        mock_from_history.assert_not_called()
+        self.assertStatistics(self.bars)
+        quote = LatestQuote.objects.get(stock=self.stock)
+        self.assertAlmostEqual(
+            quote.change_percent, (self.bars[-1][3] / self.bars[-2][3] - 1) * 100
+        )
+        self.assertEquals(quote.high_52w, 120.0)
+        self.assertEquals(quote.low_52w_date, date(2024, 2, 4))
+
+    def test_rewritten_bar(self):
+        for bar in self.bars:
+            self.add_bars([bar])
+        last = (*self.bars[-1][:3], 200.0, self.bars[-1][4])
+
+        self.add_bars([last])
+
+        self.assertStatistics(self.bars[:-1] + [last])
+
+    def test_older_bars(self):
+        self.add_bars(self.bars[20:])
+
+        self.add_bars(self.bars[:20])
+
+        self.assertStatistics(self.bars)
+
+    def test_extreme_leaves_window(self):
+        self.add_bars(self.bars)
+        quote = LatestQuote.objects.get(stock=self.stock)
+        self.assertEquals(quote.high_52w, 120.0)
+        self.assertEquals(quote.high_52w_date, date(2024, 2, 2))
+
+        self.add_bars([(date(2025, 2, 1), 100.0, 95.0, 98.0, 500.0)])
+
+        quote = LatestQuote.objects.get(stock=self.stock)
+        self.assertEquals(quote.high_52w, 116.0)
+        self.assertEquals(quote.high_52w_date, date(2024, 2, 9))
+        self.assertEquals(quote.low_52w, 84.0)
+        self.assertEquals(quote.previous_close, self.bars[-1][3])
+
+
+class TestTimeSeriesPartitions(TransactionTestCase):
+    def setUp(self):
+        app.conf.update(task_always_eager=True)
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        self.stock = StockData.objects.create(
+            symbol="AAPL", country=country, currency=currency
+        )
+
+    def add_bar(self, day):
+        StockTimeSeriesData.objects.upsert(
+            [
+                StockTimeSeriesData(
+                    stock=self.stock,
+                    date=day,
+                    open=1.0,
+                    high=1.0,
+                    low=1.0,
+                    close=1.0,
+                    volume=1.0,
+                )
+            ]
+        )
+
+    def test_upsert_creates_partition(self):
+        self.add_bar("1990-06-01")
+        self.addCleanup(detach_time_series_partition, 1990, drop=True)
+
+        self.assertIn(1990, yearly_partitions(StockTimeSeriesData))
+        self.assertEquals(StockTimeSeriesData.objects.count(), 1)
+
+    def test_known_partitions_skip_the_catalog(self):
+        self.add_bar("1990-06-01")
+        self.addCleanup(detach_time_series_partition, 1990, drop=True)
+
+        with self.assertNumQueries(0):
+            ensure_yearly_partitions(StockTimeSeriesData, {1990})
+
+    def test_create_time_series_partitions(self):
+        year = timezone.now().year
+
+        with self.settings(TIME_SERIES_PARTITIONS_AHEAD=3):
+            created = create_time_series_partitions()
+        for missing in created:
+            self.addCleanup(detach_time_series_partition, missing, drop=True)
+
+        self.assertTrue(
+            {year, year + 1, year + 2, year + 3}
+            <= yearly_partitions(StockTimeSeriesData)
+        )
+        self.assertEquals(create_time_series_partitions(), [])
+
+    def test_detach_partition(self):
+        self.add_bar("1990-06-01")
+        self.add_bar("1991-06-01")
+        self.addCleanup(detach_time_series_partition, 1991, drop=True)
+
+        self.assertTrue(detach_time_series_partition(1990, drop=True))
+
+        self.assertNotIn(1990, yearly_partitions(StockTimeSeriesData))
+        self.assertEquals(
+            list(StockTimeSeriesData.objects.values_list("date", flat=True)),
+            [date(1991, 6, 1)],
+        )
+        self.assertFalse(detach_time_series_partition(1990))
+
+
+class TestStockMovers(TestCase):
+    def setUp(self):
+        self.c = Client()
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        # Closes move from 100 to these, ZZZ only traded on a previous day
+        changes = {"AAA": 110.0, "BBB": 95.0, "CCC": 100.0, "DDD": 120.0}
+        bars = []
+        for i, (symbol, close) in enumerate(changes.items()):
+            stock = StockData.objects.create(
+                symbol=symbol, country=country, currency=currency
+            )
+            for day, price in [(1, 100.0), (2, close)]:
+                bars.append(
+                    StockTimeSeriesData(
+                        stock=stock,
+                        date=date(2024, 1, day),
+                        open=price,
+                        high=price,
+                        low=price,
+                        close=price,
+                        volume=1000.0 * (i + 1),
+                    )
+                )
+        stock = StockData.objects.create(
+            symbol="ZZZ", country=country, currency=currency
+        )
+        bars.append(
+            StockTimeSeriesData(
+                stock=stock,
+                date=date(2024, 1, 1),
+                open=1.0,
+                high=1.0,
+                low=1.0,
+                close=1.0,
+                volume=10.0**6,
+            )
+        )
+        StockTimeSeriesData.objects.upsert(bars[0::2])
+        StockTimeSeriesData.objects.upsert(bars[1::2])
+        MarketMover.objects.refresh()
+
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+
+    def get(self, **params):
+        return self.c.get(
+            "/stock/movers",
+            params,
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+    def symbols(self, response):
+        return [row["symbol"] for row in response.data["results"]]
+
+    def test_gainers(self):
+        response = self.get()
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.data["metric"], "gainers")
+        self.assertEquals(self.symbols(response), ["DDD", "AAA"])
+        self.assertAlmostEqual(response.data["results"][0]["change_percent"], 20.0)
+        self.assertEquals(response.data["results"][0]["rank"], 1)
+
+    def test_losers(self):
+        response = self.get(metric="losers")
+
+        self.assertEquals(self.symbols(response), ["BBB"])
+
+    def test_volume_limit(self):
+        response = self.get(metric="volume", limit=2)
+
+        self.assertEquals(self.symbols(response), ["DDD", "CCC"])
+
+    def test_breadth(self):
+        breadth = self.get().data["breadth"]
+
+        self.assertEquals(breadth["date"], "2024-01-02")
+        self.assertEquals(
+            [breadth["advancers"], breadth["decliners"], breadth["unchanged"]],
+            [2, 1, 1],
+        )
+
+    def test_refresh_replaces_movers(self):
+        MarketMover.objects.refresh()
+
+        self.assertEquals(MarketMover.objects.filter(metric="gainers").count(), 2)
+        self.assertEquals(MarketBreadth.objects.count(), 1)
+
+    def test_invalid_query(self):
+        self.assertEquals(self.get(metric="sideways").status_code, 400)
+        self.assertEquals(self.get(limit=0).status_code, 400)
+
+    def test_movers_without_token(self):
+        self.assertEquals(self.c.get("/stock/movers").status_code, 401)
+
+
+@override_settings(BROADCAST_WINDOW=0)
+class TestStockMoversRefreshRace(TransactionTestCase):
+    def setUp(self):
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        stock = StockData.objects.create(
+            symbol="AAPL", country=country, currency=currency
+        )
+        StockTimeSeriesData.objects.upsert(
+            [
+                StockTimeSeriesData(
+                    stock=stock,
+                    date=date(2024, 1, 2),
+                    open=1.0,
+                    high=1.0,
+                    low=1.0,
+                    close=1.0,
+                    volume=100,
+                )
+            ]
+        )
+        MarketMover.objects.refresh()
+
+    def start_thread(self, target, errors):
+        def run():
+            try:
+                target()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        thread = Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_overlapping_refreshes_wait_for_each_other(self):
+        refreshed, release, errors = Event(), Event(), []
+
+        def refresh_and_hold():
+            with transaction.atomic():
+                MarketMover.objects.refresh()
+                refreshed.set()
+                release.wait(5)
+
+        first = self.start_thread(refresh_and_hold, errors)
+        refreshed.wait(5)
+        second = self.start_thread(MarketMover.objects.refresh, errors)
+        second.join(0.5)
+        self.assertTrue(second.is_alive())
+        release.set()
+        first.join()
+        second.join()
+
+        self.assertEquals(errors, [])
+        self.assertEquals(MarketMover.objects.filter(metric="volume").count(), 1)
+
+
+class TestStockPricesData(TestCase):
+    def setUp(self):
+        self.c = Client()
+        cache.clear()
+        self.country, created = Country.objects.get_or_create(name="United States")
+        self.currency, created = Currency.objects.get_or_create(name="USD")
+        self.stock, created = StockData.objects.get_or_create(
+            symbol="AAPL",
+            country=self.country,
+            currency=self.currency,
+            last_time_series_update="2020-01-02",
+        )
+
+        StockTimeSeriesDataFactory.create(
+            open=100.0,
+            close=100.0,
+            high=100.0,
+            low=100.0,
+            volume=100000,
+            date="2020-01-01",
+            stock=self.stock,
+        )
+        StockTimeSeriesDataFactory.create(
+            open=120.0,
+            close=120.0,
+            high=120.0,
+            low=120.0,
+            volume=120000,
+            date="2020-01-02",
+            stock=self.stock,
+        )
+
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+
+    def test_stock_prices_endpoint(self):
+        response = self.c.get(
+            "/stock/prices/", headers={"Authorization": f"Bearer {self.user_token}"}
+        )
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.data.get("results")[0]["volume"], 120000)
+        self.assertEquals(response.data.get("count"), 1)
+
+    def test_stock_prices_endpoint_without_token(self):
+        response = self.c.get("/stock/prices/")
+
+        self.assertEquals(response.status_code, 401)
+
+    def test_stock_prices_endpoint_cached(self):
+        headers = {"Authorization": f"Bearer {self.user_token}"}
+        self.c.get("/stock/prices/", headers=headers)
+
+        # Only the user is loaded for authentication
+        with self.assertNumQueries(1):
+            response = self.c.get("/stock/prices/", headers=headers)
+        self.assertEquals(response.data.get("results")[0]["volume"], 120000)
+
+    def test_stock_prices_endpoint_invalidated_on_ingest(self):
+        headers = {"Authorization": f"Bearer {self.user_token}"}
+        self.c.get("/stock/prices/", headers=headers)
+
+        with self.settings(BROADCAST_WINDOW=0), self.captureOnCommitCallbacks(
+            execute=True
+        ):
+            StockTimeSeriesDataFactory.create(
+                open=130.0,
+                close=130.0,
+                high=130.0,
+                low=130.0,
+                volume=130000,
+                date="2020-01-03",
+                stock=self.stock,
+            )
+        response = self.c.get("/stock/prices/", headers=headers)
+
+        self.assertEquals(response.data.get("results")[0]["volume"], 130000)
+
+
+class TestStockPricesPagination(TestCase):
+    def setUp(self):
+        self.c = Client()
+        cache.clear()
+        self.country, created = Country.objects.get_or_create(name="United States")
+        self.currency, created = Currency.objects.get_or_create(name="USD")
+        for symbol, volume in [
+            ("A", 300),
+            ("B", 200),
+            ("C", 200),
+            ("D", 200),
+            ("E", 100),
+        ]:
+            stock = StockData.objects.create(
+                symbol=symbol, country=self.country, currency=self.currency
+            )
+            StockTimeSeriesDataFactory.create(
+                open=1.0,
+                close=1.0,
+                high=1.0,
+                low=1.0,
+                volume=volume,
+                date="2020-01-01",
+                stock=stock,
+            )
+
+        self.user = UserFactory.create()
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def test_follow_next_links(self):
+        symbols = []
+        url = "/stock/prices/?limit=2"
+        while url:
+            response = self.c.get(url, headers=self.headers)
+            self.assertEquals(response.status_code, 200)
+            symbols += [row["symbol"] for row in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEquals(symbols, ["A", "B", "C", "D", "E"])
+
+    def test_previous_link(self):
+        first_page = self.c.get("/stock/prices/?limit=2", headers=self.headers)
+        second_page = self.c.get(first_page.data["next"], headers=self.headers)
+        previous_page = self.c.get(second_page.data["previous"], headers=self.headers)
+
+        self.assertIsNone(first_page.data["previous"])
+        self.assertEquals(
+            [row["symbol"] for row in second_page.data["results"]], ["C", "D"]
+        )
+        self.assertEquals(
+            [row["symbol"] for row in previous_page.data["results"]], ["A", "B"]
+        )
+        self.assertIsNone(previous_page.data["previous"])
+
+    def test_without_count(self):
+        response = self.c.get("/stock/prices/?count=false", headers=self.headers)
+
+        self.assertNotIn("count", response.data)
+        self.assertEquals(len(response.data["results"]), 5)
+
+    def test_invalid_cursor(self):
+        response = self.c.get("/stock/prices/?cursor=wrong", headers=self.headers)
+
+        self.assertEquals(response.status_code, 404)
+
+    def test_invalid_cursor_values(self):
+        for position in (["abc", "x"], [None, "x"], [[1], "x"]):
+            cursor = json.dumps({"p": position, "r": False}).encode("utf-8")
+            encoded = base64.urlsafe_b64encode(cursor).decode("ascii")
+            response = self.c.get(
+                f"/stock/prices/?cursor={encoded}", headers=self.headers
+            )
+
+            self.assertEquals(response.status_code, 404)
+
+    def test_ordering(self):
+        for symbol, close in [("A", 1.5), ("B", 0.5), ("C", 1.5), ("D", 1.0)]:
+            StockTimeSeriesDataFactory.create(
+                open=1.0,
+                close=close,
+                high=2.0,
+                low=0.5,
+                volume=100,
+                date="2020-01-02",
+                stock=StockData.objects.get(symbol=symbol),
+            )
+
+        symbols = []
+        url = "/stock/prices/?limit=2&ordering=-change_percent"
+        while url:
+            response = self.c.get(url, headers=self.headers)
+            symbols += [row["symbol"] for row in response.data["results"]]
+            url = response.data["next"]
+        response = self.c.get(
+            "/stock/prices/?ordering=change_percent", headers=self.headers
+        )
+
+        self.assertEquals(symbols, ["C", "A", "E", "D", "B"])
+        self.assertEquals(
+            [row["symbol"] for row in response.data["results"]],
+            ["B", "D", "E", "A", "C"],
+        )
+        self.assertEquals(response.data["results"][0]["change_percent"], -50)
+
+    def test_invalid_ordering(self):
+        response = self.c.get("/stock/prices/?ordering=name", headers=self.headers)
+
+        self.assertEquals(
+            [row["symbol"] for row in response.data["results"]],
+            ["A", "B", "C", "D", "E"],
+        )
+
+
+class TestStreamingRows(TestCase):
+    def setUp(self):
+        self.c = Client()
+        cache.clear()
+        country = Country.objects.create(name="United States")
+        currency = Currency.objects.create(name="USD")
+        for symbol, volume in [("A", 300), ("B", 200), ("C", 100)]:
+            stock = StockData.objects.create(
+                symbol=symbol,
+                name=f"{symbol}, Inc.",
+                country=country,
+                currency=currency,
+            )
+            for day in [1, 2]:
+                StockTimeSeriesDataFactory.create(
+                    open=1.0,
+                    close=day + 0.5,
+                    high=3.0,
+                    low=1.0,
+                    volume=volume,
+                    date=f"2020-01-0{day}",
+                    stock=stock,
+                )
+
+        self.user = UserFactory.create()
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def get(self, url, **headers):
+        return self.c.get(url, headers={**self.headers, **headers})
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_prices_ndjson(self):
+        with self.settings(STREAM_CHUNK_SIZE=2):
+            response = self.get("/stock/prices/?format=ndjson&limit=1")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEquals([row["symbol"] for row in rows], ["A", "B", "C"])
+        self.assertEquals(rows[0]["close"], 2.5)
+
+    def test_prices_csv_ordering(self):
+        response = self.get(
+            "/stock/prices/?ordering=average_volume_30", Accept="text/csv"
+        )
+
+        self.assertEquals(response["Content-Type"], "text/csv; charset=utf-8")
+        lines = self.content(response).splitlines()
+        self.assertEquals(lines[0].split(",")[:3], ["symbol", "name", "exchange"])
+        self.assertEquals(lines[1].split(",")[:3], ["C", '"C', ' Inc."'])
+        self.assertEquals([line[0] for line in lines[1:]], ["C", "B", "A"])
+
+    def test_history_csv(self):
+        response = self.get("/stock/A/history?format=csv&columns=close,volume")
+
+        self.assertEquals(
+            self.content(response),
+            "date,close,volume\r\n2020-01-01,1.5,300\r\n2020-01-02,2.5,300\r\n",
+        )
+
+    def test_streaming_error_is_json(self):
+        response = self.get("/stock/A/history?format=ndjson&interval=year")
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response["Content-Type"], "application/json")
+        self.assertIn("interval", response.json())
+
+
+class TestFollowUnfollowEndpoint(TestCase):
+    def setUp(self):
+        self.c = Client()
+        self.country, created = Country.objects.get_or_create(name="United States")
+        self.currency, created = Currency.objects.get_or_create(name="USD")
+        self.stock, created = StockData.objects.get_or_create(
+            symbol="AAPL",
+            country=self.country,
+            currency=self.currency,
+            last_time_series_update="2020-01-02",
+        )
+
+    def test_follow_stock(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+
+        response = self.c.post(
+            "/stock/follow",
+            {"id": self.stock.id},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 200)
+
+    def test_follow_again_stock(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        self.user.following.add(self.stock)
+
+        response = self.c.post(
+            "/stock/follow",
+            {"id": self.stock.id},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 400)
+
+    def test_follow_wrong_stock(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+
+        response = self.c.post(
+            "/stock/follow",
+            {"id": 0},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 404)
+
+    def test_follow_stock_without_admin(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+
+        response = self.c.post("/stock/follow", {"id": self.stock.id})
+
+        self.assertEquals(response.status_code, 401)
+
+    def test_unfollow_stock(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        self.user.following.add(self.stock)
+
+        response = self.c.post(
+            "/stock/unfollow",
+            {"id": self.stock.id},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 200)
+
+    def test_unfollow_again_stock(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+
+        response = self.c.post(
+            "/stock/unfollow",
+            {"id": self.stock.id},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 400)
+
+    def test_follow_many_stocks(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        self.user.following.add(self.stock)
+        modified_at = self.user.modified_at
+        msft = StockData.objects.create(
+            symbol="MSFT", country=self.country, currency=self.currency
+        )
+        tsla = StockData.objects.create(
+            symbol="TSLA", country=self.country, currency=self.currency
+        )
+
+        with self.assertNumQueries(6):
+            response = self.c.post(
+                "/stock/follow",
+                {"ids": [self.stock.id, msft.id], "symbols": ["TSLA"]},
+                headers={"Authorization": f"Bearer {self.user_token}"},
+            )
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()["added"], 2)
+        self.user.refresh_from_db()
+        self.assertEquals(set(self.user.following.all()), {self.stock, msft, tsla})
+        self.assertEquals(self.user.modified_at, modified_at)
+
+    def test_follow_many_missing_stocks(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+
+        response = self.c.post(
+            "/stock/follow",
+            {"ids": [self.stock.id, 0], "symbols": ["NOPE"]},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 404)
+        self.assertEquals(response.json()["missing"], ["0", "NOPE"])
+        self.assertFalse(self.user.following.exists())
+
+    def test_follow_invalid_ids(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+
+        response = self.c.post(
+            "/stock/follow",
+            {"ids": ["x"], "symbols": [None]},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(list(response.json()["ids"]), ["0"])
+
+    def test_follow_without_stocks(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+
+        response = self.c.post(
+            "/stock/follow",
+            {},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 400)
+
+    def test_unfollow_many_stocks(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        msft = StockData.objects.create(
+            symbol="MSFT", country=self.country, currency=self.currency
+        )
+        self.user.following.add(self.stock, msft)
+
+        response = self.c.post(
+            "/stock/unfollow",
+            {"symbols": ["AAPL", "MSFT"]},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()["removed"], 2)
+        self.assertFalse(self.user.following.exists())
+
+    def test_replace_watchlist(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        msft = StockData.objects.create(
+            symbol="MSFT", country=self.country, currency=self.currency
+        )
+        tsla = StockData.objects.create(
+            symbol="TSLA", country=self.country, currency=self.currency
+        )
+        self.user.following.add(self.stock, msft)
+
+        response = self.c.put(
+            "/stock/watchlist",
+            {"symbols": ["MSFT", "TSLA"]},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()["added"], 1)
+        self.assertEquals(response.json()["removed"], 1)
+        self.assertEquals(set(self.user.following.all()), {msft, tsla})
+
+    def test_clear_watchlist(self):
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        self.user.following.add(self.stock)
+
+        response = self.c.put(
+            "/stock/watchlist",
+            {"ids": []},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 200)
+        self.assertFalse(self.user.following.exists())
+
+
+class TestHomepage(TestCase):
+    def setUp(self):
+        self.c = Client()
+        cache.clear()
+        self.country, created = Country.objects.get_or_create(name="United States")
+        self.currency, created = Currency.objects.get_or_create(name="USD")
+        self.stock, created = StockData.objects.get_or_create(
+            symbol="AAPL",
+            country=self.country,
+            currency=self.currency,
+            last_time_series_update="2021-01-01",
+        )
+
+        StockTimeSeriesDataFactory.create(
+            open=100.0,
+            close=100.0,
+            high=100.0,
+            low=100.0,
+            volume=100000,
+            date="2021-01-01",
+            stock=self.stock,
+        )
+
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        self.user.following.add(self.stock)
+
+    def test_get_homepage(self):
+        response = self.c.get(
+            "/homepage/", headers={"Authorization": f"Bearer {self.user_token}"}
+        )
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            response.headers.get("Content-Type"), "text/html; charset=utf-8"
+        )
+
+    def test_get_homepage_only_followed_stocks(self):
+        other_stock = StockData.objects.create(
+            symbol="MSFT", country=self.country, currency=self.currency
+        )
+        StockTimeSeriesDataFactory.create(
+            open=100.0,
+            close=100.0,
+            high=100.0,
+            low=100.0,
+            volume=200000,
+            date="2021-01-01",
+            stock=other_stock,
+        )
+
+        response = self.c.get(
+            "/homepage/", headers={"Authorization": f"Bearer {self.user_token}"}
+        )
+
+        self.assertEquals(
+            [stock["symbol"] for stock in response.context["stocks"]], ["AAPL"]
+        )
+
+    def test_get_homepage_invalidated_on_unfollow(self):
+        headers = {"Authorization": f"Bearer {self.user_token}"}
+        self.c.get("/homepage/", headers=headers)
+
+        self.c.post("/stock/unfollow", {"id": self.stock.id}, headers=headers)
+        response = self.c.get("/homepage/", headers=headers)
+
+        self.assertEquals(response.context["stocks"], [])
+
+    def test_get_homepage_without_token(self):
+        response = self.c.get("/homepage/")
+
+        self.assertEquals(response.status_code, 401)
+
+
+class TestStockRequest(TestCase):
+    def setUp(self):
+        self.c = Client()
+        self.user = UserFactory.create()
+        self.user_token = AccessToken.for_user(self.user)
+        self.country, created = Country.objects.get_or_create(name="United States")
+        self.currency, created = Currency.objects.get_or_create(name="USD")
+        self.stock, created = StockData.objects.get_or_create(
+            symbol="NVDA",
+            country=self.country,
+            currency=self.currency,
+            last_time_series_update="2020-01-02",
+        )
+        self.response_result_correct = {
+            "data": [
+                {
+                    "symbol": "GOOG",
+                    "name": "Alphabet Inc",
+                    "currency": "USD",
+                    "exchange": "NASDAQ",
+                    "mic_code": "XNGS",
+                    "country": "United States",
+                    "type": "Common Stock",
+                }
+            ]
+        }
+
+        self.response_result_wrong = {"data": []}
+        app.conf.update(task_always_eager=True)
+        # Eager jobs have to be stored for the status endpoint to find them
+        store_eager_result = patch.object(request_stock, "store_eager_result", True)
+        store_eager_result.start()
+        self.addCleanup(store_eager_result.stop)
+
+    def request_stock(self, symbol):
+        response = self.c.post(
+            "/stock/request",
+            {"symbol": symbol},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+        self.assertEquals(response.status_code, 202)
+        return response
+
+    def get_job(self, response, user_token=None):
+        return self.c.get(
+            response["Location"],
+            headers={"Authorization": f"Bearer {user_token or self.user_token}"},
+        )
+
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    @patch("stockApp.tasks.get_stock_time_series.delay")
+    def test_request_endpoint(self, mock_task, mock_request):
+        mock_response = MagicMock()
+        mock_response.json.return_value = self.response_result_correct
+        mock_request.return_value = mock_response
+
+        response = self.request_stock("GOOG")
+        job = self.get_job(response).json()
+
+        self.assertEquals(response.json()["id"], job["id"])
+        self.assertEquals(job["status"], "created")
+        self.assertEquals(job["stock"]["symbol"], "GOOG")
+        self.assertTrue(self.user.following.filter(symbol="GOOG").exists())
+        mock_task.assert_called_once_with("GOOG")
+        mock_request.assert_called_once()
+        self.assertEquals(mock_request.call_args.kwargs["params"]["symbol"], "GOOG")
+
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_request_endpoint_wrong_symbol(self, mock_request):
+        mock_response = MagicMock()
+        mock_response.json.return_value = self.response_result_wrong
+        mock_request.return_value = mock_response
+
+        job = self.get_job(self.request_stock("Wrong")).json()
+
+        self.assertEquals(job["status"], "not_found")
+        self.assertFalse(StockData.objects.filter(symbol="Wrong").exists())
+        mock_request.assert_called_once()
+
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_request_endpoint_upstream_error(self, mock_request):
+        mock_request.side_effect = requests.ConnectionError()
+
+        job = self.get_job(self.request_stock("GOOG")).json()
+
+        self.assertEquals(job["status"], "failed")
+
+    @patch("stockApp.tasks.broadcast")
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_request_endpoint_notifies_user(self, mock_request, mock_broadcast):
+        mock_response = MagicMock()
+        mock_response.json.return_value = self.response_result_wrong
+        mock_request.return_value = mock_response
+
+        job_id = self.request_stock("Wrong").json()["id"]
+
+        mock_broadcast.assert_called_once()
+        message = mock_broadcast.call_args.args[0]
+        self.assertEquals(message["type"], "request")
+        self.assertEquals(message["id"], job_id)
+        self.assertEquals(message["status"], "not_found")
+        self.assertEquals(
+            mock_broadcast.call_args.kwargs["groups"], [f"user.{self.user.pk}"]
+        )
+
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_request_status_of_other_user(self, mock_request):
+        mock_response = MagicMock()
+        mock_response.json.return_value = self.response_result_wrong
+        mock_request.return_value = mock_response
+        other_token = AccessToken.for_user(UserFactory.create())
+
+        response = self.get_job(self.request_stock("Wrong"), other_token)
+
+        self.assertEquals(response.status_code, 404)
+
+    def test_request_endpoint_without_stock_symbol(self):
+        response = self.c.post(
+            "/stock/request",
+            {},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 400)
+
+    def test_request_endpoint_with_already_existing_symbol(self):
+        response = self.c.post(
+            "/stock/request",
+            {"symbol": "NVDA"},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 400)
+
+    def test_request_endpoint_with_token(self):
+        response = self.c.post("/stock/request", {"symbol": "GOOG"})
+
+        self.assertEquals(response.status_code, 401)
+
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    @patch("stockApp.tasks.get_stock_time_series.delay")
+    def test_request_endpoint_listed_stock(self, mock_task, mock_request):
+        StockListing.objects.create(
+            symbol="GOOG",
+            name="Alphabet Inc",
+            exchange="NASDAQ",
+            mic_code="XNGS",
+            type="Common Stock",
+            currency=self.currency,
+            country=self.country,
+        )
+
+        response = self.request_stock("goog")
+        job = self.get_job(response).json()
+
+        self.assertEquals(response.json()["symbol"], "GOOG")
+        self.assertEquals(job["status"], "created")
+        self.assertEquals(job["stock"]["symbol"], "GOOG")
+        self.assertTrue(self.user.following.filter(symbol="GOOG").exists())
+        mock_task.assert_called_once_with("GOOG")
+        mock_request.assert_not_called()
+
+    @patch("stockApp.twelvedata.TwelveDataClient.request")
+    def test_request_endpoint_unlisted_stock(self, mock_request):
+        StockListing.objects.create(
+            symbol="GOOG",
+            name="Alphabet Inc",
+            exchange="NYSE",
+            mic_code="XNYS",
+            type="Common Stock",
+            currency=self.currency,
+            country=self.country,
+        )
+
+        response = self.c.post(
+            "/stock/request",
+            {"symbol": "GOOG"},
+            headers={"Authorization": f"Bearer {self.user_token}"},
+        )
+
+        self.assertEquals(response.status_code, 404)
+        mock_request.assert_not_called()
@@ -0,0 +1,216 @@
+import asyncio
+import os
+import random
+import time
+
+from django.conf import settings
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from stockApp.ratelimit import RedisTokenBucket
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_client = None
+_client_pid = None
+
+
+class TwelveDataClient:
+    """HTTP client for the TwelveData API.
+
+    Keeps a pooled keep-alive session, spends API credits through a token
+    bucket shared by every process and retries connection errors, 429 and 5xx
+    responses (including 429 reported in the JSON body) with jittered
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        api_key,
+        credits_per_minute,
+        timeout=(3.05, 30),
+        retries=3,
+        backoff=1.0,
+        pool_size=10,
+        rate_limit_key="ratelimit:twelvedata",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = RedisTokenBucket(
+            rate_limit_key, rate=credits_per_minute / 60, capacity=credits_per_minute
+        )
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, endpoint, params=None, credits=1, stream=False):
+        url = f"{self.base_url}/{endpoint}"
+        params = {**(params or {}), "apikey": self.api_key}
+
+        attempt = 0
+        while True:
+            self.throttle(credits)
+            retry_after = None
+            try:
+                response = self.session.get(
+                    url, params=params, timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+            else:
+                if attempt >= self.retries or not self.should_retry(response, stream):
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+
+            time.sleep(get_backoff(self.backoff, attempt, retry_after))
+            attempt += 1
+
+    def get_json(self, endpoint, params=None, credits=1):
+        return self.request(endpoint, params=params, credits=credits).json()
+
+    def throttle(self, credits):
+        wait = self.rate_limiter.reserve(credits)
+        if wait > 0:
+            time.sleep(wait)
+
+    def should_retry(self, response, stream):
+        # TwelveData reports exhausted credits with HTTP 200 and a JSON error
+        payload = None
+        if not stream and "json" in response.headers.get("Content-Type", ""):
+            try:
+                payload = response.json()
+            except ValueError:
+                pass
+        return is_retryable(response.status_code, payload)
+
+
+class AsyncTwelveDataClient:
+    """asyncio counterpart of ``TwelveDataClient`` for concurrent fetching.
+
+    At most ``concurrency`` requests are in flight and each of them spends
+    credits from the same shared token bucket before it is sent.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        api_key,
+        credits_per_minute,
+        timeout=(3.05, 30),
+        retries=3,
+        backoff=1.0,
+        concurrency=8,
+        rate_limit_key="ratelimit:twelvedata",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self.rate_limiter = RedisTokenBucket(
+            rate_limit_key, rate=credits_per_minute / 60, capacity=credits_per_minute
+        )
+        self.client = None
+
+    async def __aenter__(self):
+        connect_timeout, read_timeout = self.timeout
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def get_json(self, endpoint, params=None, credits=1):
+        params = {**(params or {}), "apikey": self.api_key}
+
+        async with self.semaphore:
+            attempt = 0
+            while True:
+                await self.throttle(credits)
+                retry_after = None
+                try:
+                    response = await self.client.get(f"/{endpoint}", params=params)
+                except httpx.TransportError:
+                    if attempt >= self.retries:
+                        raise
+                else:
+                    try:
+                        payload = response.json()
+                    except ValueError:
+                        payload = None
+                    if attempt >= self.retries or not is_retryable(
+                        response.status_code, payload
+                    ):
+                        return payload
+                    retry_after = response.headers.get("Retry-After")
+
+                await asyncio.sleep(get_backoff(self.backoff, attempt, retry_after))
+                attempt += 1
+
+    async def throttle(self, credits):
+        wait = await asyncio.to_thread(self.rate_limiter.reserve, credits)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def is_retryable(status_code, payload=None):
+    if status_code in RETRY_STATUS_CODES:
+        return True
+    return isinstance(payload, dict) and payload.get("code") in RETRY_STATUS_CODES
+
+
+def get_backoff(backoff, attempt, retry_after=None):
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return backoff * 2**attempt * random.uniform(0.5, 1.5)
+
+
+def get_client():
+    """Return the client of the current process.
+
+    Sessions must not be shared across a fork, so gunicorn and Celery prefork
+    workers each build their own after start.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client = TwelveDataClient(
+            base_url=settings.TWELVEDATA_BASE_URL,
+            api_key=settings.TWELVEDATA_API_KEY,
+            credits_per_minute=settings.TWELVEDATA_CREDITS_PER_MINUTE,
+            timeout=settings.TWELVEDATA_TIMEOUT,
+            retries=settings.TWELVEDATA_RETRIES,
+        )
+        _client_pid = os.getpid()
+    return _client
+
+
+def get_async_client():
+    return AsyncTwelveDataClient(
+        base_url=settings.TWELVEDATA_BASE_URL,
+        api_key=settings.TWELVEDATA_API_KEY,
+        credits_per_minute=settings.TWELVEDATA_CREDITS_PER_MINUTE,
+        timeout=settings.TWELVEDATA_TIMEOUT,
+        retries=settings.TWELVEDATA_RETRIES,
+        concurrency=settings.TWELVEDATA_CONCURRENCY,
+    )
@@ -19,6 +19,14 @@ urlpatterns = [
     path('stock/prices/', views.StockPrices.as_view()),
     path('stock/follow', views.FollowStock.as_view()),
     path('stock/unfollow', views.UnfollowStock.as_view()),
+    path('stock/watchlist', views.Watchlist.as_view()),
     path('homepage/', views.Homepage.as_view(), name="homepage"),
-    path('stock/request', views.StockRequest.as_view())
+    path('stock/search', views.StockSearch.as_view()),
+    path('stock/listings/search', views.StockListingSearch.as_view()),
+    path('stock/movers', views.StockMovers.as_view()),
+    path('stock/history/export', views.StockHistoryExport.as_view()),
+    path('stock/<str:symbol>/history', views.StockHistory.as_view()),
+    path('stock/<str:symbol>/indicators', views.StockIndicators.as_view()),
+    path('stock/request', views.StockRequest.as_view()),
+    path('stock/request/<uuid:job_id>', views.StockRequestStatus.as_view(), name="stock_request_status"),
 ]
@@ -1,38 +1,83 @@
-import requests as req
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.db.models import F
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
 from rest_framework import permissions
 from rest_framework import status
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import get_object_or_404, ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from stockApp.models import CustomUser, StockData, StockTimeSeriesData
+from stockApp.cache import (
+    get_following_quotes,
+    get_quotes_version,
+    get_stock_request_owner,
+    invalidate_following_quotes,
+    prices_key,
+    set_following_quotes,
+    set_stock_request_owner,
+)
+from stockApp.models import (
+    CustomUser,
+    LatestQuote,
+    MarketBreadth,
+    MarketMover,
+    StockData,
+    StockIndicator,
+    StockListing,
+    StockTimeSeriesData,
+)
+from stockApp.export import stream_export
+from stockApp.pagination import StockPricesPagination
+from stockApp.renderers import (
+    ArrowStreamRenderer,
+    CSVRenderer,
+    NDJSONRenderer,
+    ORJSONRenderer,
+    ParquetRenderer,
+    RowStreamRenderer,
+    StreamingRenderer,
+)
+from stockApp.search import get_index
 from stockApp.serializers import (
     CommonUserSerializer,
+    FollowSerializer,
+    MarketBreadthSerializer,
+    MarketMoverSerializer,
+    MarketMoversQuerySerializer,
     UpdateUserSerializer,
     StockDataWithPricesSerializer,
+    StockExportQuerySerializer,
+    StockHistoryQuerySerializer,
+    StockRangeQuerySerializer,
     StockRequestSerializer,
-    StockDataSerializer,
 )
-from stockApp.tasks import get_stock_time_series
+from stockApp.tasks import STOCK_REQUEST_PARAMS, request_stock
 
 stock_values = [
-    "stock__symbol",
-    "stock__name",
-    "stock__exchange",
-    "stock__type",
-    "stock__currency__name",
-    "stock__country__name",
-    "close",
+    "symbol",
+    "name",
+    "exchange",
+    "type",
+    "currency",
+    "country",
     "open",
     "high",
     "low",
     "close",
     "volume",
+    "change_percent",
+    "volatility_30",
+    "average_volume_30",
+    "high_52w",
+    "low_52w",
 ]
 
 
@@ -93,63 +138,144 @@ class UsersDetail(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class StockPrices(ListAPIView):
+class StreamingRowsMixin:
+    """``?format=ndjson|csv`` streams every row instead of a JSON response.
+
+    Rows are read with ``.iterator()`` and encoded a chunk at a time, so
+    memory does not grow with the result and the first byte is sent at once.
+    """
+
+    renderer_classes = [
+        *api_settings.DEFAULT_RENDERER_CLASSES,
+        NDJSONRenderer,
+        CSVRenderer,
+    ]
+
+    def is_streaming(self):
+        return isinstance(self.request.accepted_renderer, RowStreamRenderer)
+
+    def stream_rows(self, columns, rows):
+        renderer = self.request.accepted_renderer
+        return StreamingHttpResponse(
+            renderer.stream(
+                columns, rows.iterator(chunk_size=settings.STREAM_CHUNK_SIZE)
+            ),
+            content_type=self.get_content_type(renderer),
+        )
+
+    def get_content_type(self, renderer):
+        if renderer.charset:
+            return f"{renderer.media_type}; charset={renderer.charset}"
+        return renderer.media_type
+
+    def handle_exception(self, exc):
+        # Errors are reported as JSON whatever format the rows were asked in
+        renderer = getattr(self.request, "accepted_renderer", None)
+        if isinstance(renderer, StreamingRenderer):
+            self.request.accepted_renderer = ORJSONRenderer()
+            self.request.accepted_media_type = ORJSONRenderer.media_type
+        return super().handle_exception(exc)
+
+
+class StockPrices(StreamingRowsMixin, ListAPIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = StockPricesPagination
 
     def get(self, request):
-        result = (
-            StockTimeSeriesData.objects.filter(date=F("stock__last_time_series_update"))
-            .values(*stock_values)
-            .order_by("-volume", "stock__symbol")
-        )
+        if self.is_streaming():
+            ordering = self.paginator.get_ordering(request)
+            rows = LatestQuote.objects.order_by(*ordering).values_list(*stock_values)
+            return self.stream_rows(stock_values, rows)
+
+        key = prices_key(request, get_quotes_version())
+        data = cache.get(key)
+        if data is None:
+            data = self.get_prices_data()
+            cache.set(key, data, settings.QUOTES_CACHE_TIMEOUT)
+        return Response(data)
+
+    def get_prices_data(self):
+        result = LatestQuote.objects.values(*stock_values).order_by("-volume", "symbol")
 
         page = self.paginate_queryset(result)
         if page is not None:
             serializer = StockDataWithPricesSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(serializer.data).data
 
         serializer = StockDataWithPricesSerializer(result, many=True)
-        return Response(serializer.data)
+        return serializer.data
 
 
-class FollowStock(APIView):
+class FollowingView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get_stocks(self, request):
+        """Validated request data and the ids of every stock it names."""
+        serializer = FollowSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        ids = set(data.get("ids", []))
+        if "id" in data:
+            ids.add(data["id"])
+        symbols = set(data.get("symbols", []))
+        stocks = StockData.objects.filter(Q(pk__in=ids) | Q(symbol__in=symbols))
+        stocks = dict(stocks.values_list("pk", "symbol"))
+        missing = sorted(ids - stocks.keys()) + sorted(symbols - set(stocks.values()))
+        if missing:
+            raise NotFound({"message": "Stocks not found", "missing": missing})
+        return data, list(stocks)
+
+    @staticmethod
+    def is_single(data):
+        # A lone id keeps the strict semantics of the original endpoints
+        return set(data) == {"id"}
+
+
+class FollowStock(FollowingView):
     def post(self, request):
-        stock_id = request.data.get("id")
-        stock = get_object_or_404(StockData, pk=stock_id)
+        data, stock_ids = self.get_stocks(request)
         user = request.user
 
-        if user.following.filter(pk=stock_id).exists():
+        added = user.follow(stock_ids)
+        if not added and self.is_single(data):
             return Response(
                 {"message": "Stock already followed"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        if added:
+            invalidate_following_quotes(user.pk)
 
-        user.following.add(stock)
-        user.save()
+        return Response({"message": "Success", "added": len(added)})
 
-        return Response({"message": "Success"})
-
-
-class UnfollowStock(APIView):
-    permission_classes = [IsAuthenticated]
 
+class UnfollowStock(FollowingView):
     def post(self, request):
-        stock_id = request.data.get("id")
-        stock = get_object_or_404(StockData, pk=stock_id)
+        data, stock_ids = self.get_stocks(request)
         user = request.user
 
-        # Check if the user is already following the stock
-        if not user.following.filter(pk=stock_id).exists():
+        removed = user.unfollow(stock_ids)
+        if not removed and self.is_single(data):
             return Response(
                 {"message": "Stock not followed"}, status=status.HTTP_400_BAD_REQUEST
             )
+        if removed:
+            invalidate_following_quotes(user.pk)
 
-        user.following.remove(stock)
-        user.save()
+        return Response({"message": "Success", "removed": removed})
 
-        return Response({"message": "Success"})
+
+class Watchlist(FollowingView):
+    def put(self, request):
+        """Replace the followed stocks in one transaction."""
+        data, stock_ids = self.get_stocks(request)
+        user = request.user
+
+        added, removed = user.set_following(stock_ids)
+        if added or removed:
+            invalidate_following_quotes(user.pk)
+
+        return Response({"message": "Success", "added": len(added), "removed": removed})
 
 
 class Homepage(APIView):
@@ -157,34 +283,203 @@ class Homepage(APIView):
 
     def get(self, request):
         user = request.user
-        stocks_ids = user.following.values_list("id", flat=True)
-        stocks = (
-            StockTimeSeriesData.objects.filter(
-                date=F("stock__last_time_series_update"), stock__id__in=stocks_ids
+        version = get_quotes_version()
+        stocks = get_following_quotes(user.pk, version)
+        if stocks is None:
+            result = (
+                LatestQuote.objects.filter(stock__in=user.following.values("id"))
+                .values(*stock_values)
+                .order_by("-volume", "symbol")
             )
-            .values(*stock_values)
-            .order_by("-volume", "stock__symbol")
+            stocks = StockDataWithPricesSerializer(result, many=True).data
+            set_following_quotes(user.pk, version, stocks)
+
+        return render(request, "index.html", {"user": user, "stocks": stocks})
+
+
+class StockRangeView(StreamingRowsMixin, APIView):
+    """Base of the per date rows of a stock filtered by ``from`` and ``to``."""
+
+    permission_classes = [IsAuthenticated]
+    query_serializer_class = StockRangeQuerySerializer
+
+    def get_query(self, request):
+        query_serializer = self.query_serializer_class(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        return query_serializer.validated_data
+
+    def filter_dates(self, queryset, query):
+        if "start" in query:
+            queryset = queryset.filter(date__gte=query["start"])
+        if "end" in query:
+            queryset = queryset.filter(date__lte=query["end"])
+        return queryset
+
+    def get_rows_data(self, columns, rows, shape):
+        if shape == "columns":
+            # Parallel arrays repeat no keys, which keeps long histories small
+            values = list(zip(*rows)) or [()] * len(columns)
+            return dict(zip(columns, map(list, values)))
+        return [dict(zip(columns, row)) for row in rows]
+
+
+class StockHistory(StockRangeView):
+    query_serializer_class = StockHistoryQuerySerializer
+
+    def get(self, request, symbol):
+        query = self.get_query(request)
+        stock = get_object_or_404(StockData, symbol=symbol)
+
+        # Only the requested columns are read, close and volume come from
+        # the covering index
+        bars = self.filter_dates(StockTimeSeriesData.objects.filter(stock=stock), query)
+        bars = bars.candles(query["interval"], query["columns"])
+        columns = ["date", *query["columns"]]
+        if self.is_streaming():
+            return self.stream_rows(columns, bars)
+        return Response(
+            {
+                "symbol": stock.symbol,
+                "interval": query["interval"],
+                "bars": self.get_rows_data(columns, bars, query["shape"]),
+            }
+        )
+
+
+class StockHistoryExport(StockRangeView):
+    """Daily bars of a set of symbols as an Arrow IPC stream or Parquet file.
+
+    ``symbols`` is required and capped by ``EXPORT_MAX_SYMBOLS``. Pick the
+    format with ``?format=arrow|parquet`` or the Accept header.
+    """
+
+    query_serializer_class = StockExportQuerySerializer
+    renderer_classes = [ArrowStreamRenderer, ParquetRenderer]
+
+    def get(self, request):
+        query = self.get_query(request)
+        bars = self.filter_dates(
+            StockTimeSeriesData.objects.filter(stock__symbol__in=query["symbols"]),
+            query,
+        )
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            stream_export(
+                bars, renderer.format, settings.EXPORT_BATCH_SIZE, query["columns"]
+            ),
+            content_type=renderer.media_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="history.{renderer.format}"'
+        )
+        return response
+
+
+class StockIndicators(StockRangeView):
+    columns = [
+        "date",
+        "sma_20",
+        "sma_50",
+        "ema_12",
+        "ema_26",
+        "rsi_14",
+        "bollinger_upper",
+        "bollinger_lower",
+        "vwap_20",
+    ]
+
+    def get(self, request, symbol):
+        query = self.get_query(request)
+        stock = get_object_or_404(StockData, symbol=symbol)
+
+        rows = (
+            self.filter_dates(StockIndicator.objects.filter(stock=stock), query)
+            .order_by("date")
+            .values_list(*self.columns)
+        )
+        if self.is_streaming():
+            return self.stream_rows(self.columns, rows)
+        return Response(
+            {
+                "symbol": stock.symbol,
+                "indicators": self.get_rows_data(self.columns, rows, query["shape"]),
+            }
+        )
+
+
+class StockSearch(APIView):
+    permission_classes = [IsAuthenticated]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        results = get_index().search(query, self.get_limit(request))
+        return Response({"results": results})
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params["limit"])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+
+class StockListingSearch(StockSearch):
+    """Instruments of the listing catalog, including ones nobody added yet."""
+
+    fields = ["symbol", "name", "exchange", "mic_code", "type", "currency", "country"]
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"results": []})
+        listings = StockListing.objects.search(query).values_list(
+            "symbol",
+            "name",
+            "exchange",
+            "mic_code",
+            "type",
+            "currency__name",
+            "country__name",
         )
+        results = [
+            dict(zip(self.fields, listing))
+            for listing in listings[: self.get_limit(request)]
+        ]
+        return Response({"results": results})
+
 
-        return render(
-            request,
-            "index.html",
+class StockMovers(APIView):
+    """Top movers and market breadth from the summary refreshed on ingestion."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query_serializer = MarketMoversQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        query = query_serializer.validated_data
+
+        movers = (
+            MarketMover.objects.filter(metric=query["metric"])
+            .values(*MarketMoverSerializer._declared_fields)
+            .order_by("rank")[: query["limit"]]
+        )
+        breadth = MarketBreadth.objects.filter(pk=MarketBreadth.SINGLETON_ID).first()
+        return Response(
             {
-                "user": user,
-                "stocks": StockDataWithPricesSerializer(stocks, many=True).data,
-            },
+                "metric": query["metric"],
+                "results": MarketMoverSerializer(movers, many=True).data,
+                "breadth": MarketBreadthSerializer(breadth).data if breadth else None,
+            }
         )
 
 
 class StockRequest(APIView):
     permission_classes = [IsAuthenticated]
-    base_url = "https://api.twelvedata.com/stocks"
-    params = {
-        "country": "United States",
-        "exchange": "NASDAQ",
-        "type": "Common Stock",
-        "currency": "USD",
-    }
 
     def post(self, request):
         request_serializer = StockRequestSerializer(data=request.data)
@@ -193,40 +488,45 @@ class StockRequest(APIView):
                 request_serializer.errors, status=status.HTTP_400_BAD_REQUEST
             )
 
-        self.params["symbol"] = request_serializer.data.get("symbol")
-        response = req.get(self.base_url, params=self.params)
-        data = response.json().get("data")
-        if len(data) == 0:
-            return Response(
-                {
-                    "message": f"No stock listed with provided symbol - {self.params['symbol']}"
-                },
-                status=status.HTTP_404_NOT_FOUND,
-            )
-
-        stock_serializer = StockDataSerializer(data=data[0])
-        if stock_serializer.is_valid():
-            stock_serializer.save()
-            request.user.following.add(stock_serializer.data.get("id"))
-            request.user.save()
-
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "market",
-                {
-                    "type": "chat.message",
-                    "message": {
-                        "symbol": stock_serializer.data.get("symbol"),
-                        "price": "---",
-                        "type": "add",
-                        "currency": stock_serializer.data.get("currency"),
-                        "name": stock_serializer.data.get("name"),
-                    },
-                },
+        symbol = request_serializer.data.get("symbol")
+        # Once the catalog is loaded it rejects unknown symbols up front and
+        # the job adds listed ones without spending upstream credits
+        if StockListing.objects.exists():
+            listing = (
+                StockListing.objects.listed(**STOCK_REQUEST_PARAMS)
+                .filter(symbol=symbol.upper())
+                .first()
             )
+            if listing is None:
+                return Response(
+                    {"message": f"No stock listed with provided symbol - {symbol}"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            symbol = listing.symbol
+
+        # The client polls the job or waits for the "request" message on its socket
+        job_id = str(uuid.uuid4())
+        set_stock_request_owner(job_id, request.user.pk)
+        request_stock.apply_async(args=[request.user.pk, symbol], task_id=job_id)
 
-            get_stock_time_series.delay(stock_serializer.data.get("symbol"))
-            return Response(stock_serializer.data, status=status.HTTP_201_CREATED)
         return Response(
-            stock_serializer.errors, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {"id": job_id, "status": "pending", "symbol": symbol},
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": reverse("stock_request_status", args=[job_id])},
         )
+
+
+class StockRequestStatus(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job_id = str(job_id)
+        if get_stock_request_owner(job_id) != request.user.pk:
+            raise NotFound()
+
+        result = request_stock.AsyncResult(job_id)
+        if not result.ready():
+            return Response({"id": job_id, "status": "pending"})
+        if not result.successful():
+            return Response({"id": job_id, "status": "failed"})
+        return Response({"id": job_id, **result.result})
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_celery_results',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -144,6 +145,15 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'stockApp.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'stockApp.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 20
 }
@@ -158,18 +168,60 @@ CELERY_RESULT_BACKEND = "django-db"
 CELERY_TIMEZONE = 'Europe/Warsaw'
 
 CELERY_BEAT_SCHEDULE = {
+    'refresh_stock_listings': {
+        'task': "stockApp.tasks.refresh_stock_listings",
+        'schedule': crontab(hour="8", minute="31"),
+    },
     'get_stock_time_series': {
         'task': "stockApp.tasks.get_all_stocks_time_series",
         'schedule': crontab(hour="9", minute="01"),
     },
+    'create_time_series_partitions': {
+        'task': "stockApp.tasks.create_time_series_partitions",
+        'schedule': crontab(day_of_month="1", hour="0", minute="17"),
+    },
 }
 
 # Traveldata
 
 TWELVEDATA_API_KEY = env("TWELVEDATA_API_KEY")
+TWELVEDATA_BASE_URL = env("TWELVEDATA_BASE_URL", default="https://api.twelvedata.com")
+TWELVEDATA_TIMEOUT = (3.05, env.float("TWELVEDATA_READ_TIMEOUT", default=30))
+TWELVEDATA_RETRIES = env.int("TWELVEDATA_RETRIES", default=3)
+TWELVEDATA_CREDITS_PER_MINUTE = env.int("TWELVEDATA_CREDITS_PER_MINUTE", default=8)
+TWELVEDATA_BATCH_SIZE = env.int("TWELVEDATA_BATCH_SIZE", default=8)
+TWELVEDATA_CONCURRENCY = env.int("TWELVEDATA_CONCURRENCY", default=8)
+TIME_SERIES_CHUNK_SIZE = env.int("TIME_SERIES_CHUNK_SIZE", default=1000)
+# Rows encoded per chunk of NDJSON and CSV responses
+STREAM_CHUNK_SIZE = env.int("STREAM_CHUNK_SIZE", default=2000)
+# Rows per record batch of history exports
+EXPORT_BATCH_SIZE = env.int("EXPORT_BATCH_SIZE", default=65536)
+# Symbols one history export may ask for
+EXPORT_MAX_SYMBOLS = env.int("EXPORT_MAX_SYMBOLS", default=100)
+# Ranked quotes kept for every /stock/movers metric
+MARKET_MOVERS_SIZE = env.int("MARKET_MOVERS_SIZE", default=100)
+# Yearly bar partitions created ahead of the current year
+TIME_SERIES_PARTITIONS_AHEAD = env.int("TIME_SERIES_PARTITIONS_AHEAD", default=1)
+
+# Redis
+
+REDIS_URL = f"redis://{env('REDIS_HOST')}:{env('REDIS_PORT')}"
+STORE_REDIS_URL = f"{REDIS_URL}/2"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"{REDIS_URL}/1",
+    },
+}
+QUOTES_CACHE_TIMEOUT = env.int("QUOTES_CACHE_TIMEOUT", default=60 * 60 * 24)
+# Stock request jobs can be polled for as long as their results are kept
+STOCK_REQUEST_TIMEOUT = 60 * 60 * 24
 
 # WS
 
+BROADCAST_WINDOW = env.float("BROADCAST_WINDOW", default=1.0)
+
 ASGI_APPLICATION = "stockProject.asgi.application"
 CHANNEL_LAYERS = {
     'default': {